@@ -0,0 +1,42 @@
+import pytest
+
+import texplain
+
+# toggle one option (and the options that it requires)
+_options = {
+    "default": {},
+    "indentation": {"indentation": ""},
+    "rstrip": {"rstrip": False, "sentence": False, "argument": False},
+    "lstrip": {"lstrip": False, "sentence": False, "argument": False, "indentation": ""},
+    "squashlines": {"squashlines": False},
+    "squashspaces": {"squashspaces": False},
+    "symbols": {"symbols": False},
+    "environment": {"environment": False, "indentation": ""},
+    "argument": {"argument": False},
+    "inlinemath": {"inlinemath": False, "indentation": ""},
+    "linebreak": {"linebreak": False},
+    "itemize": {"itemize": False},
+    "sentence": {"sentence": False},
+    "alignment": {"alignment": False},
+    "texindent": {"texindent": False},
+    "noindent": {"noindent": False},
+}
+
+
+@pytest.mark.parametrize("option", _options)
+def test_indent(benchmark, main, option):
+    benchmark(texplain.indent, main, **_options[option])
+
+
+def test_indent_formatted(benchmark, formatted):
+    benchmark(texplain.indent, formatted)
+
+
+def test_align(benchmark, size):
+    rows = [f"{i:d} & {i ** 2:d} & $x_{{{i:d}}}$ \\\\" for i in range(size // 30)]
+    text = "\n".join(["\\begin{tabular}{ccc}"] + rows + ["\\end{tabular}"])
+    benchmark(texplain._align, text)
+
+
+def test_one_sentence_per_line(benchmark, main):
+    benchmark(texplain._one_sentence_per_line, main)
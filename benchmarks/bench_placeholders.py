@@ -0,0 +1,17 @@
+import pytest
+
+import texplain
+
+# all types that can be searched for (lines are only used internally)
+_ptypes = [ptype for ptype in texplain.PlaceholderType if ptype != texplain.PlaceholderType.line]
+
+
+@pytest.mark.parametrize("ptype", _ptypes, ids=lambda ptype: ptype.name)
+def test_text_to_placeholders(benchmark, main, ptype):
+    benchmark(texplain.text_to_placeholders, main, [ptype])
+
+
+@pytest.mark.parametrize("ptype", _ptypes, ids=lambda ptype: ptype.name)
+def test_text_from_placeholders(benchmark, main, ptype):
+    text, placeholders = texplain.text_to_placeholders(main, [ptype])
+    benchmark(texplain.text_from_placeholders, text, placeholders)
@@ -0,0 +1,84 @@
+"""
+Check that the run time of the entry points grows (nearly) linearly with the size of the input:
+the exponent ``b`` of ``time ~ size ** b`` (fitted on a couple of sizes) should not exceed
+a bound (that leaves room for timing noise and ``n log n`` behaviour).
+As these checks are based on timings they are not part of the test suite; run (from this
+directory) with::
+
+    python -m pytest bench_scaling.py
+"""
+
+import re
+import time
+
+import numpy as np
+
+import texplain
+from tests import corpus
+
+# maximal growth exponent
+_max_exponent = 1.4
+
+
+def _exponent(func: callable, make: callable, sizes: list[int], repeat: int = 5) -> float:
+    """
+    Fit the growth exponent of the run time.
+
+    :param func: Function to time, called as ``func(*make(size))``.
+    :param make: Function that generates the arguments of ``func`` for a given size.
+    :param sizes: Sizes of the input.
+    :param repeat: Number of repetitions (the fastest is used).
+    :return: Exponent.
+    """
+    times = []
+    for size in sizes:
+        args = make(size)
+        best = np.inf
+        for _ in range(repeat):
+            tic = time.perf_counter()
+            func(*args)
+            best = min(best, time.perf_counter() - tic)
+        times += [best]
+    return np.polyfit(np.log(sizes), np.log(times), 1)[0]
+
+
+def _main(size: int) -> tuple[str]:
+    return (corpus.main(size),)
+
+
+def _document(size: int) -> tuple[str]:
+    # strip "sec:", "eq:", ... from the labels such that all labels are changed
+    tex, _ = corpus.document(size)
+    return (re.sub(r"\{(sec|eq|fig|tab):", r"{\1", tex),)
+
+
+def _bib(nkeys: int) -> tuple[str, list[str]]:
+    return corpus.bib(nkeys), [f"Author{i:d}" for i in range(nkeys, 0, -2)]
+
+
+def _format_labels(text: str):
+    texplain.TeX(text).format_labels()
+
+
+def _replace_command(text: str):
+    texplain.TeX(text).replace_command(r"{\TG}[2]", "#2")
+
+
+def test_indent():
+    assert _exponent(texplain.indent, _main, [10000, 20000, 40000]) < _max_exponent
+
+
+def test_format_labels():
+    assert _exponent(_format_labels, _document, [50000, 100000, 200000]) < _max_exponent
+
+
+def test_replace_command():
+    assert _exponent(_replace_command, _document, [50000, 100000, 200000]) < _max_exponent
+
+
+def test_bib_select():
+    assert _exponent(texplain.bib_select, _bib, [2000, 4000, 8000]) < _max_exponent
+
+
+def test_find_command():
+    assert _exponent(texplain.find_command, _main, [50000, 100000, 200000]) < _max_exponent
@@ -0,0 +1,21 @@
+import texplain
+
+
+def test_find_commented(benchmark, main):
+    benchmark(texplain.find_commented, main)
+
+
+def test_find_matching(benchmark, main):
+    benchmark(texplain.find_matching, main, "{", "}", ignore_escaped=True)
+
+
+def test_find_command(benchmark, main):
+    benchmark(texplain.find_command, main)
+
+
+def test_find_command_name(benchmark, main):
+    benchmark(texplain.find_command, main, "label")
+
+
+def test_document_index(benchmark, main):
+    benchmark(lambda: texplain.DocumentIndex(main).braces)
@@ -0,0 +1,24 @@
+"""
+Benchmarks of the start-up time: the time of a fresh interpreter that imports the module
+(and that formats a short text).
+Compared against a bare interpreter and against an interpreter that (also) imports NumPy,
+which is the cost that the lazy import of NumPy avoids.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+_code = {
+    "python": "pass",
+    "numpy": "import numpy",
+    "import": "import texplain",
+    "import+numpy": "import texplain, numpy",
+    "indent": "import texplain; texplain.indent('This is a sentence. And another one.')",
+}
+
+
+@pytest.mark.parametrize("case", _code)
+def test_startup(benchmark, case):
+    benchmark.pedantic(subprocess.check_call, args=([sys.executable, "-c", _code[case]],), rounds=5)
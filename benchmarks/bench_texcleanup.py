@@ -0,0 +1,52 @@
+import pytest
+
+import texplain
+
+
+def _run(benchmark, document, method, *args, **kwargs):
+    """
+    Time a method of a fresh :py:class:`texplain.TeX` (that is modified in-place).
+    """
+
+    def setup():
+        return (texplain.TeX(document),), {}
+
+    def run(tex):
+        getattr(tex, method)(*args, **kwargs)
+
+    benchmark.pedantic(run, setup=setup, rounds=5)
+
+
+def test_init(benchmark, document):
+    benchmark(texplain.TeX, document)
+
+
+@pytest.mark.parametrize("method", ["remove_commentlines", "remove_comments"])
+def test_comments(benchmark, document, method):
+    _run(benchmark, document, method)
+
+
+def test_replace_command(benchmark, document):
+    _run(benchmark, document, "replace_command", r"{\emph}[1]", "#1", ignore_commented=True)
+
+
+def test_change_label(benchmark, document):
+    _run(benchmark, document, "change_label", "eq:1", "eq:one")
+
+
+def test_format_labels(benchmark, document):
+    _run(benchmark, document, "format_labels")
+
+
+def test_use_cleveref(benchmark, document):
+    _run(benchmark, document, "use_cleveref")
+
+
+def test_fix_quotes(benchmark, document):
+    _run(benchmark, document, "fix_quotes")
+
+
+def test_changed(benchmark, document):
+    tex = texplain.TeX(document)
+    tex.fix_quotes()
+    benchmark(tex.changed)
@@ -0,0 +1,68 @@
+"""
+Benchmarks of the scanning and formatting functions,
+on synthetic documents of increasing size (see :py:mod:`tests.corpus`).
+Run (from this directory) with::
+
+    python -m pytest --sizes 10000,100000,1000000 --benchmark-json results.json
+
+To track regressions store the results, and compare later runs against them::
+
+    python -m pytest --benchmark-autosave
+    python -m pytest --benchmark-compare --benchmark-compare-fail=mean:10%
+"""
+
+import functools
+
+import pytest
+
+import texplain
+from tests import corpus
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--sizes",
+        type=str,
+        default="10000,100000",
+        help="Comma-separated sizes (number of characters) of the documents.",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "size" in metafunc.fixturenames:
+        sizes = [int(i) for i in metafunc.config.getoption("sizes").split(",")]
+        metafunc.parametrize("size", sizes)
+
+
+@functools.lru_cache
+def _document(size: int) -> str:
+    return corpus.document(size)[0]
+
+
+@functools.lru_cache
+def _main(size: int) -> str:
+    return corpus.main(size)
+
+
+@pytest.fixture
+def main(size) -> str:
+    """
+    Main text of a document of (at least) ``size`` characters.
+    """
+    return _main(size)
+
+
+@pytest.fixture
+def document(size) -> str:
+    """
+    Document (preamble, main text, postamble) of (at least) ``size`` characters.
+    """
+    return _document(size)
+
+
+@pytest.fixture
+def formatted(size) -> str:
+    """
+    Main text of a document of (at least) ``size`` characters, formatted by ``indent``.
+    """
+    return texplain.indent(_main(size))
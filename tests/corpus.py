@@ -0,0 +1,312 @@
+"""
+Generate synthetic LaTeX documents (and a matching BibTeX database) of a chosen size.
+The output only depends on the size and the seed.
+The documents contain all constructs that are replaced by placeholders
+(see :py:class:`texplain.PlaceholderType`), nested environments, labels, references,
+citations, and figures.
+
+Use from the command line to write a document to disk::
+
+    python -m tests.corpus --size 1000000 --seed 0 output.tex
+"""
+
+import argparse
+import pathlib
+import random
+
+_words = """
+    the of a model stress strain we in is that for this as with by are be on which our it at
+    from can an these results shown system yield plastic elastic material sample random field
+    energy barrier event avalanche disorder deformation flow interface depinning force load
+    measured observed simulation particle amorphous solid glass distribution scaling exponent
+""".split()
+
+_blocks = [
+    "paragraph",
+    "equation",
+    "itemize",
+    "table",
+    "figure",
+    "noindent",
+    "texindent",
+    "verbatim",
+    "if",
+]
+
+_preamble = r"""\documentclass[aps,prl]{revtex4-1}
+
+\usepackage{amsmath}
+\usepackage{graphicx}
+\usepackage{xcolor}
+\usepackage{cleveref}
+
+\newif\ifdraft
+\drafttrue
+\let\oldvec\vec
+\newcommand{\TG}[2]{{\color{red}\sout{#1}}{\color{blue}#2}}
+
+\begin{document}
+
+\title{A synthetic document}
+
+\begin{abstract}
+-ABSTRACT-
+\end{abstract}
+
+\maketitle
+"""
+
+_postamble = r"""
+
+\bibliography{-BIBLIOGRAPHY-}
+
+\end{document}
+"""
+
+
+class _Generator:
+    """
+    Generator of blocks of a synthetic document.
+
+    :param seed: Seed of the random number generator.
+    """
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.labels = {"sec": 0, "eq": 0, "fig": 0, "tab": 0}
+        self.nkeys = 0
+
+    def label(self, kind: str) -> str:
+        self.labels[kind] += 1
+        return f"{kind}:{self.labels[kind]:d}"
+
+    def ref(self) -> str:
+        kinds = [kind for kind, n in self.labels.items() if n > 0]
+        if len(kinds) == 0:
+            return "the above"
+        kind = self.rng.choice(kinds)
+        i = self.rng.randint(1, self.labels[kind])
+        cmd = self.rng.choice(["ref", "cref", "Cref", "eqref" if kind == "eq" else "cref"])
+        return f"\\{cmd}{{{kind}:{i:d}}}"
+
+    def cite(self) -> str:
+        n = self.rng.randint(1, 3)
+        keys = []
+        for _ in range(n):
+            if self.nkeys == 0 or self.rng.random() < 0.3:
+                self.nkeys += 1
+                keys += [f"Author{self.nkeys:d}"]
+            else:
+                keys += [f"Author{self.rng.randint(1, self.nkeys):d}"]
+        return f"\\cite{{{','.join(keys)}}}"
+
+    def math(self) -> str:
+        symbol = self.rng.choice(["x", "y", "\\sigma", "\\varepsilon", "E", "\\tau"])
+        return self.rng.choice([
+            f"{symbol}_{{{self.rng.randint(0, 9):d}}}",
+            f"\\frac{{{symbol}}}{{2}}",
+            f"{symbol}^2 + 1",
+            f"\\langle {symbol} \\rangle",
+        ])
+
+    def sentence(self) -> str:
+        rng = self.rng
+        insert = [
+            lambda: f"${self.math()}$",
+            lambda: f"\\({self.math()}\\)",
+            lambda: f"(see {self.ref()})",
+            self.cite,
+            lambda: f"\\emph{{{rng.choice(_words)}}}",
+            lambda: f"\\textbf{{{rng.choice(_words)} {rng.choice(_words)}}}",
+            lambda: f"\\footnote{{{rng.choice(_words).capitalize()} {rng.choice(_words)}.}}",
+            lambda: f"\\TG{{{rng.choice(_words)}}}{{{rng.choice(_words)}}}",
+            lambda: "e.g.\\ ",
+            lambda: "100\\%",
+            lambda: "``quoted''",
+        ]
+        words = [rng.choice(_words) for _ in range(rng.randint(4, 18))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randint(0, len(words)), rng.choice(insert)())
+        ret = " ".join(words)
+        return ret[0].upper() + ret[1:] + rng.choice([".", ".", ".", "?", "!"])
+
+    def paragraph(self) -> str:
+        rng = self.rng
+        lines = []
+        for _ in range(rng.randint(2, 7)):
+            sentence = self.sentence()
+            if rng.random() < 0.1:
+                sentence += " % " + " ".join(rng.choice(_words) for _ in range(3))
+            if rng.random() < 0.5 and len(lines) > 0:
+                lines[-1] += " " + sentence
+            else:
+                lines += [sentence]
+        if rng.random() < 0.2:
+            lines.insert(rng.randint(0, len(lines)), "% " + self.sentence())
+        return "\n".join(lines)
+
+    def equation(self) -> str:
+        rng = self.rng
+        kind = rng.choice(["equation", "align", "display"])
+        if kind == "display":
+            return f"\\[\n{self.math()} = {self.math()}\n\\]"
+        if kind == "align":
+            rows = [f"{self.math()} &= {self.math()}" for _ in range(rng.randint(2, 4))]
+            return "\\begin{align}\n" + " \\\\\n".join(rows) + "\n\\end{align}"
+        return (
+            f"\\begin{{equation}}\n\\label{{{self.label('eq')}}}\n"
+            f"{self.math()} = \\left( {self.math()} \\right)\n\\end{{equation}}"
+        )
+
+    def itemize(self, depth: int = 0) -> str:
+        rng = self.rng
+        env = rng.choice(["itemize", "enumerate"])
+        lines = [f"\\begin{{{env}}}"]
+        for _ in range(rng.randint(2, 5)):
+            lines += [f"\\item {self.sentence()}"]
+            if depth < 2 and rng.random() < 0.3:
+                lines += [self.itemize(depth + 1)]
+        lines += [f"\\end{{{env}}}"]
+        return "\n".join(lines)
+
+    def table(self) -> str:
+        rng = self.rng
+        ncol = rng.randint(2, 5)
+        rows = []
+        for _ in range(rng.randint(2, 8)):
+            row = [rng.choice([str(rng.randint(0, 10 ** rng.randint(1, 4))), f"${self.math()}$"])]
+            row += [rng.choice(_words) for _ in range(ncol - 1)]
+            rows += [" & ".join(row) + " \\\\"]
+        return "\n".join([
+            "\\begin{table}[htp]",
+            "\\centering",
+            f"\\begin{{tabular}}{{{'c' * ncol}}}",
+            "\\hline",
+            *rows,
+            "\\hline",
+            "\\end{tabular}",
+            f"\\caption{{{self.sentence()}}}",
+            f"\\label{{{self.label('tab')}}}",
+            "\\end{table}",
+        ])
+
+    def figure(self) -> str:
+        name = f"figures/{self.rng.choice(_words)}_{self.labels['fig'] + 1:d}"
+        return "\n".join([
+            "\\begin{figure}[htp]",
+            "\\centering",
+            f"\\includegraphics[width=0.5\\linewidth]{{{name}}}",
+            f"\\caption{{{self.sentence()}}}",
+            f"\\label{{{self.label('fig')}}}",
+            "\\end{figure}",
+        ])
+
+    def block(self, kind: str = None) -> str:
+        rng = self.rng
+        if kind is None:
+            kind = rng.choices(_blocks, weights=[20, 5, 3, 2, 2, 1, 1, 1, 1])[0]
+        if kind == "paragraph":
+            return self.paragraph()
+        if kind == "equation":
+            return self.paragraph() + "\n" + self.equation() + "\n" + self.sentence()
+        if kind == "itemize":
+            return self.itemize()
+        if kind == "table":
+            return self.table()
+        if kind == "figure":
+            return self.figure()
+        if kind == "noindent":
+            lines = ["% \\begin{noindent}", self.sentence(), "  " + self.sentence()]
+            return "\n".join(lines + ["% \\end{noindent}"])
+        if kind == "texindent":
+            lines = ["% \\begin{texindent}{sentence=False}", self.sentence(), self.sentence()]
+            return "\n".join(lines + ["% \\end{texindent}"])
+        if kind == "verbatim":
+            return f"\\begin{{verbatim}}\n  {self.sentence()}\n\\end{{verbatim}}"
+        return f"\\ifdraft\n{self.sentence()}\n\\else\n{self.sentence()}\n\\fi"
+
+    def section(self, kinds: list[str] = None) -> str:
+        rng = self.rng
+        cmd = rng.choice(["section", "section", "subsection"])
+        title = " ".join(rng.choice(_words) for _ in range(rng.randint(1, 4))).capitalize()
+        if kinds is None:
+            kinds = [None] * rng.randint(2, 8)
+        blocks = [f"\\{cmd}{{{title}}}\n\\label{{{self.label('sec')}}}"]
+        blocks += [self.block(kind) for kind in kinds]
+        return "\n\n".join(blocks)
+
+
+def bib(nkeys: int, seed: int = 0) -> str:
+    """
+    Generate a BibTeX database with keys ``Author1``, ``Author2``, ...
+
+    :param nkeys: Number of entries.
+    :param seed: Seed of the random number generator.
+    :return: The BibTeX database.
+    """
+    rng = random.Random(seed)
+    ret = []
+    for i in range(1, nkeys + 1):
+        title = " ".join(rng.choice(_words) for _ in range(rng.randint(3, 10))).capitalize()
+        ret += [
+            "\n".join([
+                f"@article{{Author{i:d},",
+                f"  author = {{Author{i:d}, A. and Other, B.}},",
+                f"  title = {{{title}}},",
+                f"  journal = {{Journal of {rng.choice(_words).capitalize()}}},",
+                f"  year = {{{rng.randint(1950, 2030):d}}},",
+                f"  volume = {{{rng.randint(1, 200):d}}},",
+                f"  pages = {{{rng.randint(1, 9999):d}}},",
+                "}",
+            ])
+        ]
+    return "\n\n".join(ret) + "\n"
+
+
+def document(size: int, seed: int = 0, bibliography: str = "library") -> tuple[str, str]:
+    """
+    Generate a document.
+
+    :param size: Minimal number of characters of the document.
+    :param seed: Seed of the random number generator.
+    :param bibliography: Name of the BibTeX database (as used in ``\\bibliography{...}``).
+    :return: ``(tex, bib)``: the document and the BibTeX database with all cited keys.
+    """
+    gen = _Generator(seed)
+    sections = []
+    n = len(_preamble) + len(_postamble)
+    abstract = gen.paragraph()
+    while n < size:
+        # the first section contains all kinds of blocks
+        sections += [gen.section(None if len(sections) > 0 else _blocks + _blocks)]
+        n += len(sections[-1]) + 2
+    tex = _preamble.replace("-ABSTRACT-", abstract) + "\n\n".join(sections)
+    tex += _postamble.replace("-BIBLIOGRAPHY-", bibliography)
+    return tex, bib(gen.nkeys, seed)
+
+
+def main(size: int, seed: int = 0) -> str:
+    """
+    Main text of a document (the part between ``\\begin{document}`` and ``\\end{document}``).
+
+    :param size: Minimal number of characters.
+    :param seed: Seed of the random number generator.
+    :return: The text.
+    """
+    tex, _ = document(size, seed)
+    return tex.split("\\begin{document}\n")[1].split("\\end{document}")[0]
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic LaTeX document.")
+    parser.add_argument("--size", type=float, default=1e5, help="Minimal number of characters.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed.")
+    parser.add_argument("output", type=pathlib.Path, help="Output TeX file (and .bib).")
+    args = parser.parse_args()
+    tex, bibtex = document(int(args.size), args.seed, args.output.stem)
+    args.output.write_text(tex)
+    args.output.with_suffix(".bib").write_text(bibtex)
+
+
+if __name__ == "__main__":
+    _main()
@@ -1,3 +1,5 @@
+import pytest
+
 import texplain
 
 
@@ -194,3 +196,94 @@ Foo bar
         tex = texplain.TeX(text)
         tex.format_labels()
         assert str(tex).strip() == text.strip()
+
+
+def test_innermost():
+    text = r"""
+\begin{example}
+    \begin{equation}
+        \label{foo}
+        a = b
+    \end{equation}
+    \footnote{Foo \label{bar}.}
+    \label{baz}
+\end{example}
+"""
+    tex = texplain.TeX(text)
+    tex.format_labels()
+    assert tex.labels() == ["eq:foo", "note:bar", "misc:baz"]
+
+
+def test_intervals():
+    intervals = texplain._Intervals([(0, 10, 1), (2, 5, 2), (3, 4, 3), (6, 12, 4)])
+    assert [intervals[i] for i in range(14)] == [1, 1, 2, 3, 2, 1, 4, 4, 4, 4, 4, 4, 0, 0]
+
+
+def test_change_labels():
+    text = r"""
+\section{Foo}
+\label{foo}
+\begin{equation}
+    \label{bar}
+\end{equation}
+See \cref{foo,bar}, \Cref{foo}, \eqref{bar}, and \ref{baz}.
+"""
+
+    expected = r"""
+\section{Foo}
+\label{bar}
+\begin{equation}
+    \label{foo}
+\end{equation}
+See \cref{bar,foo}, \Cref{bar}, \eqref{foo}, and \ref{baz}.
+"""
+
+    tex = texplain.TeX(text)
+    tex.change_labels({"foo": "bar", "bar": "foo"})
+    assert str(tex).strip() == expected.strip()
+
+    with pytest.raises(OSError):
+        texplain.TeX(text).change_labels({"foo": "bar"})
+
+    with pytest.raises(OSError):
+        texplain.TeX(text).change_labels({"foo": "new", "bar": "new"})
+
+    # "baz" is only referenced
+    with pytest.raises(OSError):
+        texplain.TeX(text).change_labels({"baz": "foo"})
+
+    with pytest.raises(OSError):
+        texplain.TeX(text).change_label("baz", "foo")
+
+
+def test_label_index():
+    text = r"""
+\section{Foo} \label{sec:foo}
+\begin{equation} \label{eq:a} \end{equation}
+\begin{equation} \label{eq:a} \end{equation}
+See \cref{sec:foo,eq:a} and \eqref{eq:b}.
+"""
+    index = texplain.LabelIndex(text)
+    assert list(index) == ["sec:foo", "eq:a"]
+    assert "eq:a" in index
+    assert "eq:b" not in index
+    assert index.duplicates() == ["eq:a"]
+    assert index.undefined() == ["eq:b"]
+    assert index.definitions["sec:foo"] == [text.index(r"\label{sec:foo}")]
+    assert index.references["eq:a"] == [text.index(r"\cref")]
+    assert texplain.TeX(text).labels() == ["sec:foo", "eq:a"]
+
+
+def test_label_index_href():
+    text = r"""
+\section{Foo} \label{sec:foo}
+See \autoref{sec:foo}, \pageref{sec:bar}, and \href{https://example.com}{this page}.
+"""
+    index = texplain.LabelIndex(text)
+    assert index.undefined() == ["sec:bar"]
+    assert "https://example.com" not in index.references
+
+    tex = texplain.TeX(text)
+    tex.change_label("sec:foo", "sec:baz")
+    assert r"\href{https://example.com}" in tex.main
+    assert r"\autoref{sec:baz}" in tex.main
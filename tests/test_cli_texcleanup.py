@@ -1,3 +1,5 @@
+import pytest
+
 import texplain
 
 
@@ -15,3 +17,109 @@ This is some \emph{italic text} that needes formatting.
 
     texplain.texcleanup(["--re-sub", r"{\\it\s+(.*)}", r"\\emph{\1}", str(fpath)])
     assert fpath.read_text().strip() == formatted.strip()
+
+
+def test_cache(tmp_path):
+    text = r"""
+This is "some" text.
+    """
+
+    formatted = r"""
+This is ``some'' text.
+    """
+
+    fpath = tmp_path / "test.tex"
+    cache = tmp_path / "cache"
+    fpath.write_text(text.strip())
+
+    texplain.texcleanup(["--fix-quotes", "--cache-dir", str(cache), str(fpath)])
+    assert fpath.read_text().strip() == formatted.strip()
+    assert len(list(cache.glob("*/*"))) == 1
+
+    fpath.write_text(text.strip())
+    texplain.texcleanup(["--fix-quotes", "--cache-dir", str(cache), str(fpath)])
+    assert fpath.read_text().strip() == formatted.strip()
+    assert len(list(cache.glob("*/*"))) == 1
+
+    fpath.write_text(text.strip())
+    texplain.texcleanup(["--cache-dir", str(cache), str(fpath)])
+    assert fpath.read_text().strip() == text.strip()
+    assert len(list(cache.glob("*/*"))) > 1
+
+
+def test_cache_not_idempotent(tmp_path):
+    fpath = tmp_path / "test.tex"
+    cache = tmp_path / "cache"
+    fpath.write_text("a")
+
+    # the cache does not change the result of running twice
+    for expect in ["aa", "aaaa"]:
+        texplain.texcleanup(["--re-sub", "a", "aa", "--cache-dir", str(cache), str(fpath)])
+        assert fpath.read_text().strip() == expect
+
+
+def test_jobs(tmp_path, capsys):
+    text = r"""
+This is "some" text.
+    """
+
+    formatted = r"""
+This is ``some'' text.
+    """
+
+    files = [tmp_path / f"test_{i:d}.tex" for i in range(4)]
+    for file in files:
+        file.write_text(text.strip())
+    files[1].write_text(formatted.strip() + "\n")
+    files[2].write_text(r"\input{foo}")
+
+    ret = texplain.texcleanup(["--fix-quotes", "--jobs", "2"] + [str(i) for i in files])
+    assert ret == 1
+    assert files[0].read_text().strip() == formatted.strip()
+    assert files[1].read_text().strip() == formatted.strip()
+    assert files[2].read_text() == r"\input{foo}"
+    assert files[3].read_text().strip() == formatted.strip()
+
+    out, err = capsys.readouterr()
+    assert out.strip() == "texcleanup: 2 changed, 1 unchanged, 1 failed"
+    assert err.startswith(f"texcleanup: {files[2]}: OSError")
+
+
+def test_change_label(tmp_path):
+    fpath = tmp_path / "test.tex"
+    text = "\\label{a} \\label{d} \\ref{a} \\cref{a,d}"
+
+    fpath.write_text(text)
+    args = ["--change-label", "a", "b", "--change-label", "b", "c", "--change-label", "a", "e"]
+    texplain.texcleanup(args + [str(fpath)])
+    assert fpath.read_text().strip() == "\\label{c} \\label{d} \\ref{c} \\cref{c,d}"
+
+    fpath.write_text(text)
+    args = ["--change-label", "a", "b", "--change-label", "b", "a"]
+    texplain.texcleanup(args + [str(fpath)])
+    assert fpath.read_text().strip() == text
+
+    fpath.write_text(text)
+    args = ["-l", "a", "tmp", "-l", "d", "a", "-l", "tmp", "d"]
+    texplain.texcleanup(args + [str(fpath)])
+    assert fpath.read_text().strip() == "\\label{d} \\label{a} \\ref{d} \\cref{d,a}"
+
+    fpath.write_text(text)
+    with pytest.raises(OSError):
+        texplain.texcleanup(["--change-label", "a", "d", str(fpath)])
+    assert fpath.read_text() == text
+
+
+def test_serial(tmp_path, capsys):
+    fpath = tmp_path / "test.tex"
+    fpath.write_text('This is "some" text.')
+
+    assert texplain.texcleanup(["--fix-quotes", str(fpath)]) == 0
+    assert capsys.readouterr().out == ""
+
+    assert texplain.texcleanup(["--verbose", str(fpath)]) == 0
+    assert capsys.readouterr().out.strip() == "texcleanup: 0 changed, 1 unchanged, 0 failed"
+
+    fpath.write_text(r"\input{foo}")
+    with pytest.raises(OSError):
+        texplain.texcleanup([str(fpath)])
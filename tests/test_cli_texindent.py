@@ -0,0 +1,243 @@
+import concurrent.futures
+import functools
+import os
+import socketserver
+import threading
+import time
+
+import pytest
+
+import texplain
+
+
+def test_cache(tmp_path):
+    text = r"""
+This is a sentence. And another one.
+"""
+
+    formatted = r"""
+This is a sentence.
+And another one.
+"""
+
+    fpath = tmp_path / "test.tex"
+    cache = tmp_path / "cache"
+    fpath.write_text(text.strip())
+
+    texplain.texindent_cli(["--cache-dir", str(cache), str(fpath)])
+    assert fpath.read_text().strip() == formatted.strip()
+
+    # recently modified files are always read
+    stat = texplain.FormatCache(cache, {"tool": "texindent"})
+    assert not stat.is_clean(fpath)
+    os.utime(fpath, ns=(10**18, 10**18))
+    texplain.texindent_cli(["--cache-dir", str(cache), str(fpath)])
+    assert stat.is_clean(fpath)
+
+    # unchanged files are not read
+    # (here: a change is not detected as modification time and size are kept)
+    changed = fpath.read_text().replace("sentence.\n", "sentence. ")
+    fpath.write_text(changed)
+    os.utime(fpath, ns=(10**18, 10**18))
+    texplain.texindent_cli(["--cache-dir", str(cache), str(fpath)])
+    assert fpath.read_text() == changed
+
+    # the content is leading if the modification time changes
+    os.utime(fpath)
+    texplain.texindent_cli(["--cache-dir", str(cache), str(fpath)])
+    assert fpath.read_text().strip() == formatted.strip()
+
+
+def test_format_cache(tmp_path):
+    cache = texplain.FormatCache(tmp_path, {"foo": True}, maxsize=200)
+    other = texplain.FormatCache(tmp_path, {"foo": False}, maxsize=200)
+
+    assert cache.get("a") is None
+    cache.set("a", "b")
+    cache.set("c", "c")
+    assert cache.get("a") == "b"
+    assert cache.get("c") == "c"
+    assert other.get("a") is None
+
+    cache.prune()
+    assert cache.get("a") == "b"
+
+    cache.set("x" * 300, "y" * 300)
+    cache.prune()
+    assert cache.get("x" * 300) is None
+
+    cache.clear()
+    assert cache.get("a") is None
+
+
+def test_jobs(tmp_path, capsys):
+    text = "This is a sentence. And another one."
+    formatted = "This is a sentence.\nAnd another one."
+
+    files = []
+    for i in range(4):
+        files += [tmp_path / f"test_{i:d}.tex"]
+        files[-1].write_text("\n".join([text] * (i + 1)))
+    files[2].write_text("$$ a $$")
+
+    assert texplain.texindent_cli(["--jobs", "2"] + [str(i) for i in files]) == 1
+    assert files[0].read_text().strip() == formatted
+    assert files[1].read_text().strip() == "\n".join([formatted] * 2)
+    assert files[2].read_text() == "$$ a $$"
+    assert files[3].read_text().strip() == "\n".join([formatted] * 4)
+
+    err = capsys.readouterr().err.splitlines()
+    assert len(err) == 1
+    assert err[0].startswith(f"texindent: {files[2]}: NotImplementedError")
+
+    assert texplain.texindent_cli(["--jobs", "0", str(files[0]), str(files[1])]) == 0
+
+
+def test_split_sections(tmp_path):
+    text = "\\section{Foo}\n\nThis is a sentence. And another one.\n\n\\section{Bar}\n\nText.\n"
+    formatted = texplain.indent(text)
+
+    fpath = tmp_path / "test.tex"
+    fpath.write_text(text)
+    assert texplain.texindent_cli(["--split-sections", "--jobs", "2", str(fpath)]) == 0
+    assert fpath.read_text().strip() == formatted.strip()
+
+
+@pytest.mark.skipif(
+    not hasattr(socketserver, "ThreadingUnixStreamServer"), reason="No Unix sockets"
+)
+def test_daemon(tmp_path):
+    text = "This is a sentence. And another one."
+    formatted = "This is a sentence.\nAnd another one.\n"
+
+    fpath = tmp_path / "test.tex"
+    fpath.write_text(text)
+    socket = str(tmp_path / "texindent.sock")
+    handler = functools.partial(
+        texplain._texindent_request, cache=None, apply=texplain._texindent_file
+    )
+    daemon = threading.Thread(target=texplain.texindent_daemon, args=(handler, socket, 1))
+    daemon.start()
+
+    for _ in range(100):
+        if os.path.exists(socket):
+            break
+        time.sleep(0.05)
+
+    assert os.stat(socket).st_mode & 0o077 == 0
+
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        futures = [pool.submit(texplain.texindent_client, {"text": text}, socket) for _ in range(4)]
+        futures += [pool.submit(texplain.texindent_client, {"files": [str(fpath)]}, socket)]
+        responses = [future.result() for future in futures]
+
+    assert responses[0] == {"status": 0, "errors": [], "text": formatted}
+    assert responses[-1] == {"status": 0, "errors": []}
+    assert fpath.read_text() == formatted
+
+    response = texplain.texindent_client({"text": "$$ a $$"}, socket)
+    assert response["status"] == 1
+    assert response["text"] == "$$ a $$"
+
+    # stops after the idle timeout
+    daemon.join(timeout=10)
+    assert not daemon.is_alive()
+    assert not os.path.exists(socket)
+
+
+def test_client_fallback(tmp_path, monkeypatch):
+    text = "This is a sentence. And another one."
+    formatted = "This is a sentence.\nAnd another one."
+
+    fpath = tmp_path / "test.tex"
+    fpath.write_text(text)
+    socket = str(tmp_path / "texindent.sock")
+    assert texplain.texindent_cli(["--client", "--socket", socket, str(fpath)]) == 0
+    assert fpath.read_text().strip() == formatted
+
+    # e.g. on Windows
+    fpath.write_text(text)
+    monkeypatch.delattr(texplain.socket, "AF_UNIX", raising=False)
+    assert texplain.texindent_cli(["--client", "--socket", socket, str(fpath)]) == 0
+    assert fpath.read_text().strip() == formatted
+
+
+def test_daemon_files(tmp_path, capsys):
+    fpath = tmp_path / "test.tex"
+    fpath.write_text("This is a sentence.")
+
+    with pytest.raises(SystemExit):
+        texplain.texindent_cli(["--daemon", str(fpath)])
+    assert "--daemon does not take files" in capsys.readouterr().err
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="no user ids")
+def test_check_owner(tmp_path, monkeypatch):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    texplain._check_owner(str(shared))
+
+    # owned by another user
+    uid = os.getuid()
+    monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+    with pytest.raises(PermissionError):
+        texplain._check_owner(str(shared))
+    with pytest.raises(PermissionError):
+        texplain._check_owner(str(shared), sticky=True)
+
+    # shared directory such as /tmp
+    shared.chmod(0o1777)
+    texplain._check_owner(str(shared), sticky=True)
+    with pytest.raises(PermissionError):
+        texplain._check_owner(str(shared))
+
+
+def test_profile(tmp_path, capsys):
+    files = []
+    for i in range(2):
+        files += [tmp_path / f"test_{i:d}.tex"]
+        files[-1].write_text("This is a sentence. And another one.")
+
+    assert texplain.texindent_cli(["--profile"] + [str(i) for i in files]) == 0
+    assert files[0].read_text().strip() == "This is a sentence.\nAnd another one."
+
+    err = capsys.readouterr().err
+    assert err.startswith(str(files[0]))
+    assert str(files[1]) in err
+    assert "all 2 files" in err
+    assert "sentence/argument" in err
+    assert "regex scans" in err
+
+
+def test_cache_files(tmp_path, monkeypatch):
+    text = "This is a sentence. And another one."
+    formatted = "This is a sentence.\nAnd another one."
+
+    files = [tmp_path / "a.tex", tmp_path / "b.tex"]
+    for fpath in files:
+        fpath.write_text(text)
+
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    assert texplain.texindent_cli(["--cache"] + [str(i) for i in files]) == 0
+    assert [fpath.read_text().strip() for fpath in files] == [formatted] * 2
+    assert (tmp_path / "cache" / "texplain").is_dir()
+
+    for fpath in files:
+        fpath.write_text(text)
+
+    cache = tmp_path / "other"
+    assert texplain.texindent_cli(["--cache-dir", str(cache)] + [str(i) for i in files]) == 0
+    assert [fpath.read_text().strip() for fpath in files] == [formatted] * 2
+    assert cache.is_dir()
+
+
+def test_jobs_serial(tmp_path, capsys):
+    fpath = tmp_path / "test.tex"
+    fpath.write_text("$$ a $$")
+
+    with pytest.raises(NotImplementedError):
+        texplain.texindent_cli([str(fpath)])
+
+    with pytest.raises(SystemExit):
+        texplain.texindent_cli(["--jobs", "-1", str(fpath)])
+    assert "invalid number of jobs" in capsys.readouterr().err
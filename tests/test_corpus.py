@@ -0,0 +1,37 @@
+import texplain
+
+from . import corpus
+
+
+def test_deterministic():
+    assert corpus.document(5000, 1) == corpus.document(5000, 1)
+    assert corpus.document(5000, 1) != corpus.document(5000, 2)
+
+    tex, _ = corpus.document(20000, 1)
+    assert len(tex) >= 20000
+    assert len(tex) < 40000
+    assert tex.startswith(corpus.document(5000, 1)[0].split("\\maketitle")[0])
+
+
+def test_placeholders():
+    """
+    All types of placeholders occur.
+    """
+    text, _ = corpus.document(5000)
+    for ptype in texplain.PlaceholderType:
+        if ptype != texplain.PlaceholderType.line:
+            _, placeholders = texplain.text_to_placeholders(text, [ptype])
+            assert len(placeholders) > 0, ptype
+
+
+def test_bib():
+    tex, bib = corpus.document(5000)
+    keys = texplain.TeX(tex).citation_keys()
+    assert len(keys) > 0
+    assert texplain.bib_select(bib, keys).count("@article") == len(set(keys))
+
+
+def test_indent():
+    tex, _ = corpus.document(5000)
+    formatted = texplain.indent(tex)
+    assert texplain.indent(formatted) == formatted
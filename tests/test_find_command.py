@@ -90,3 +90,38 @@ def test_math():
     text = r"\begin{equation} [0, 1) \end{equation}"
     expect = [[r"\begin", r"{equation}"], [r"\end", r"{equation}"]]
     assert expect == convert(text, texplain.find_command(text))
+
+
+def test_limit():
+    text = r"\foo[a][b]{c}{d} \bar{e}[f]{g}"
+    expect = [[r"\foo", r"[a]", r"[b]", r"{c}"], [r"\bar", r"{e}", r"[f]"]]
+    ret = texplain.find_command(text, max_options=2, max_arguments=1)
+    assert expect == convert(text, ret)
+
+    expect = [[r"\foo"], [r"\bar", r"{e}"]]
+    ret = texplain.find_command(text, max_options=0, max_arguments=1)
+    assert expect == convert(text, ret)
+
+
+def test_unmatched():
+    text = r"\foo{a}[b \bar{c}"
+    expect = [[r"\foo", r"{a}"], [r"\bar", r"{c}"]]
+    assert expect == convert(text, texplain.find_command(text))
+
+
+def test_multiple():
+    text = r"\foo[a]{b} \bar{c}{d} \baz{e} \foo{f} % \bar{g}"
+    expect = {
+        "foo": [[r"\foo", r"[a]", r"{b}"], [r"\foo", r"{f}"]],
+        "bar": [[r"\bar", r"{c}", r"{d}"]],
+        "qux": [],
+    }
+    ret = texplain.find_commands(text, ["foo", "bar", "qux"])
+    assert expect == {key: convert(text, value) for key, value in ret.items()}
+
+    expect = {
+        "foo": [[r"\foo"], [r"\foo", r"{f}"]],
+        "bar": [[r"\bar", r"{c}"]],
+    }
+    ret = texplain.find_commands(text, ["foo", "bar"], max_options={"foo": 0}, max_arguments=1)
+    assert expect == {key: convert(text, value) for key, value in ret.items()}
@@ -0,0 +1,89 @@
+import pathlib
+
+import texplain
+
+
+def test_identical():
+    text = (pathlib.Path(__file__).parent / "input1" / "example.tex").read_text()
+    memo = texplain.IndentMemo()
+    assert texplain.indent_incremental(text, memo) == texplain.indent(text)
+    assert texplain.indent_incremental(text, memo, sentence=False) == texplain.indent(
+        text, sentence=False
+    )
+
+
+def test_reuse():
+    text = r"""
+This is a paragraph. With two sentences.
+
+
+% a comment
+\begin{itemize}
+\item Foo.
+
+\item Bar.
+\end{itemize}
+
+This is the last
+paragraph.
+"""
+
+    formatted = r"""
+This is a paragraph.
+With two sentences.
+
+
+% a comment
+\begin{itemize}
+    \item Foo.
+
+    \item Bar.
+\end{itemize}
+
+This is the last paragraph.
+"""
+
+    memo = texplain.IndentMemo()
+    assert texplain.indent_incremental(text, memo) == formatted.strip()
+    assert len(memo) == 3
+    ret = texplain.indent_incremental(text.replace("last", "final"), memo)
+    assert ret == formatted.replace("last", "final").strip()
+    assert len(memo) == 4
+
+
+def test_bounded():
+    memo = texplain.IndentMemo(maxsize=2)
+    text = "\n\n".join([f"Paragraph {i}." for i in range(5)])
+    assert texplain.indent_incremental(text, memo) == text
+    assert len(memo) == 2
+
+
+def test_comments():
+    """
+    Blank lines before (indented) comments are kept, as by :py:func:`texplain.indent`.
+    """
+    texts = [
+        "Some text.\n\n\n  % a comment\nMore text.\n",
+        "Some text.\n\n\n\t% a comment\n\n\n    % another comment\nMore text.\n",
+        "Some text.\n\n\n  % \\begin{noindent}\n a\n\n b\n% \\end{noindent}\n\n\nMore text.\n",
+    ]
+    for text in texts:
+        for kwargs in [{}, {"squashlines": False}, {"noindent": False}]:
+            expect = texplain.indent(text, **kwargs)
+            ret = texplain.indent_incremental(text, texplain.IndentMemo(), **kwargs)
+            assert ret == expect
+
+
+def test_unbalanced():
+    """
+    Text that is not split at blank lines consistently is formatted as one block.
+    """
+    texts = [
+        "\n\n$$ a $$\n\nSome text.\n",
+        "% \\begin{noindent}\na\n% \\end{noindent} \\begin{itemize}\n\\item a\n\n\\item b\n"
+        "\\end{itemize}\n\nSome text.\n",
+        "Some text.\n\n% \\end{noindent} \\begin{itemize}\n\\item a\n\n\\item b\n\\end{itemize}\n",
+    ]
+    for text in texts:
+        ret = texplain.indent_incremental(text, texplain.IndentMemo())
+        assert ret == texplain.indent(text)
@@ -0,0 +1,43 @@
+import pathlib
+
+import texplain
+
+
+def test_example():
+    text = (pathlib.Path(__file__).parent / "input1" / "example.tex").read_text()
+    tex = texplain.TeX(text)
+    assert texplain.indent_parallel(tex.main, jobs=2) == texplain.indent(tex.main)
+
+
+def test_sections():
+    text = r"""
+Some introduction. With two sentences.
+
+\section{Foo}
+
+\begin{itemize}
+\item Foo.
+
+\section{Not a cut}
+\end{itemize}
+
+% a comment
+\section{Bar}
+Text {
+\section{Not a cut}
+}
+
+
+\subsection{Baz}
+
+\section*{Last}
+Text. More text.
+"""
+
+    blocks = texplain._indent_blocks(texplain._rstrip_lines(text.strip()))
+    assert len(blocks) == 6
+
+    for kwargs in [{}, {"squashlines": False}, {"sentence": False}]:
+        expect = texplain.indent(text, **kwargs)
+        assert texplain.indent_parallel(text, jobs=2, **kwargs) == expect
+        assert texplain.indent_parallel(text, jobs=1, **kwargs) == expect
@@ -0,0 +1,32 @@
+import texplain
+
+
+def test_stages():
+    text = r"""
+This is a sentence. And another one.
+
+% \begin{texindent}{sentence=False}
+Not split. In sentences.
+% \end{texindent}
+"""
+
+    with texplain.IndentProfile() as profile:
+        formatted = texplain.indent(text)
+        texplain.indent(formatted)
+
+    assert formatted == texplain.indent(text)
+    assert list(profile.calls)[0] == "rstrip"
+    assert list(profile.calls)[-1] == "restore"
+    assert all(calls == 2 for calls in profile.calls.values())
+    assert profile.size["rstrip"] == len(text) + len(formatted)
+    assert all(time >= 0 for time in profile.time.values())
+    assert profile.report().splitlines()[-1].startswith("total")
+
+    # not recorded outside of the context
+    texplain.indent(text)
+    assert all(calls == 2 for calls in profile.calls.values())
+
+    total = texplain.IndentProfile()
+    total += profile
+    total += profile
+    assert all(calls == 4 for calls in total.calls.values())
@@ -1189,6 +1189,61 @@ some more text.
     assert ret.strip() == formatted.strip()
 
 
+def test_math_environment_starred():
+    text = r"""
+Some text \begin{equation*} a = b \end{equation*} \begin{figure*}[htb] foo \end{figure*}
+"""
+
+    formatted = r"""
+Some text
+\begin{equation*}
+    a = b
+\end{equation*}
+\begin{figure*}[htb]
+    foo
+\end{figure*}
+"""
+
+    ret = texplain.indent(text)
+    assert ret.strip() == formatted.strip()
+
+
+def test_nested_blocks():
+    text = r"""
+\begin{itemize}
+\item \foo{a
+b} \begin{enumerate}
+\item \ifbar x \else y \fi
+\end{enumerate}
+\item \baz[c,
+d]{e}
+\end{itemize}
+"""
+
+    formatted = r"""
+\begin{itemize}
+    \item \foo{
+        a b
+    }
+    \begin{enumerate}
+        \item
+        \ifbar
+            x
+        \else
+            y
+        \fi
+    \end{enumerate}
+    \item \baz[
+        c,
+        d
+    ]{e}
+\end{itemize}
+"""
+
+    ret = texplain.indent(text)
+    assert ret.strip() == formatted.strip()
+
+
 def test_code():
     text = r"""
 % a comment
@@ -0,0 +1,66 @@
+import io
+import pathlib
+
+import texplain
+
+
+def test_identical():
+    text = (pathlib.Path(__file__).parent / "input1" / "example.tex").read_text()
+    tex = texplain.TeX(text)
+    unsplit = {"rstrip": False, "sentence": False, "argument": False, "indentation": ""}
+    for kwargs in [{}, {"squashlines": False}, unsplit]:
+        expect = texplain.indent(tex.main, **kwargs)
+        assert "".join(texplain.indent_stream(io.StringIO(tex.main), **kwargs)) == expect
+        assert "".join(texplain.indent_stream(tex.main.splitlines(), **kwargs)) == expect
+
+
+def test_lines(tmp_path):
+    text = "One. Two.\n\nPara three.\n\n\n\\begin{itemize}\n\\item a\n\n\\item b\n\\end{itemize}\n"
+    expect = texplain.indent(text)
+    assert "".join(texplain.indent_stream(text.splitlines())) == expect
+    assert "".join(texplain.indent_stream(text.splitlines(keepends=True))) == expect
+
+    fpath = tmp_path / "test.tex"
+    fpath.write_text(text)
+    with open(fpath) as file:
+        assert "".join(texplain.indent_stream(file)) == expect
+
+
+def test_bounded():
+    """
+    Formatted lines are yielded before all lines are read.
+    """
+    paragraph = ["This is a sentence. And another one.\n", "\n"]
+    itemize = ["\\begin{itemize}\n", "\\item a\n", "\n", "\\item b\n", "\\end{itemize}\n", "\n"]
+    read = []
+
+    def lines(n):
+        for i in range(n):
+            for line in paragraph + itemize:
+                read.append(line)
+                yield line
+
+    stream = texplain.indent_stream(lines(200))
+    assert next(stream) == "This is a sentence.\n"
+    assert len(read) < 100
+
+    expect = texplain.indent("".join(lines(200)))
+    read.clear()
+    assert "".join(texplain.indent_stream(lines(200))) == expect
+
+
+def test_blank_lines():
+    """
+    Runs of blank lines are squashed, except before (indented) comments.
+    """
+    texts = [
+        "Some text.\n\n\n  % a comment\nMore text.\n",
+        "Some text.\n\n\n\n\nMore text.\n\n\n\t% a comment\n\n\n    % another comment\nEnd.\n",
+        "\n\n$$ a $$\n\n\n\nSome text.\n",
+    ]
+    for text in texts:
+        for kwargs in [{}, {"squashlines": False}]:
+            expect = texplain.indent(text, **kwargs)
+            assert "".join(texplain.indent_stream(text.splitlines(), **kwargs)) == expect
+            ret = "".join(texplain.indent_stream(text.splitlines(keepends=True), **kwargs))
+            assert ret == expect
@@ -0,0 +1,98 @@
+import json
+import re
+
+import texplain
+
+from . import corpus
+
+
+def test_counters():
+    text = "\\section{Foo}\n\nA sentence with $a + b$. \\footnote{Foo.\nBar \\emph{\nbaz}.}\n"
+
+    with texplain.PerformanceCounters() as counters:
+        formatted = texplain.indent(text)
+
+    assert formatted == texplain.indent(text)
+    assert counters.scans > 0
+    assert counters.scanned >= len(text)
+    assert counters.copied > 0
+    assert counters.depth == 2
+    assert counters.placeholders[texplain.PlaceholderType.inline_math] == 1
+
+    data = counters.as_dict()
+    assert json.loads(json.dumps(data)) == data
+    assert data["placeholders"]["inline_math"] == 1
+    assert "regex scans" in counters.report()
+
+
+def test_nested():
+    text = "A sentence. Another sentence."
+
+    with texplain.PerformanceCounters() as outer:
+        texplain.indent(text)
+        scans = outer.scans
+        with texplain.PerformanceCounters() as inner:
+            texplain.indent(text)
+
+    assert inner.scans > 0
+    assert outer.scans == scans + inner.scans
+
+
+def test_inactive():
+    counters = texplain.PerformanceCounters()
+    texplain.indent("A sentence. Another sentence.")
+    assert counters.scans == 0
+
+
+def test_scans(monkeypatch):
+    """
+    All regex scans over a full text are counted: a scan of a (long) text that is not
+    counted is a scan that is missing in the counters.
+    """
+
+    size = 5000  # all texts that are scanned in parts are shorter
+    counted = []  # texts of counted scans
+    pending = []  # counted scan that has not been run yet
+    uncounted = []
+
+    class Proxy:
+        def __getattr__(self, name):
+            func = getattr(re, name)
+            if name not in ["finditer", "findall", "search", "split", "sub", "subn"]:
+                return func
+
+            def scan(pattern, *args, **kwargs):
+                text = args[1] if name in ["sub", "subn"] else args[0]
+                if len(pending) > 0:
+                    assert pending.pop() is text
+                elif len(text) >= size:
+                    uncounted.append((name, pattern))
+                return func(pattern, *args, **kwargs)
+
+            return scan
+
+    count_scan = texplain._count_scan
+
+    def record(text):
+        assert len(pending) == 0
+        counted.append(text)
+        pending.append(text)
+        count_scan(text)
+
+    monkeypatch.setattr(texplain, "re", Proxy())
+    monkeypatch.setattr(texplain, "_count_scan", record)
+
+    document = corpus.document(4 * size)[0]
+
+    with texplain.PerformanceCounters() as counters:
+        texplain.indent(texplain.TeX(document).main)
+        tex = texplain.TeX(document)
+        tex.format_labels()
+        tex.replace_command(r"{\emph}[1]", "#1")
+        tex.use_cleveref()
+        tex.citation_keys()
+
+    assert uncounted == []
+    assert pending == []
+    assert counters.scans == len(counted)
+    assert counters.scanned == sum(map(len, counted))
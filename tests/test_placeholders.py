@@ -35,6 +35,51 @@ def test_placeholders_select():
     assert text == placeholder.to_text("foo   place   baz")
 
 
+def test_placeholders_batch():
+    """
+    Replacing several blocks at once equals replacing them one-by-one.
+    """
+    text = "a  \\foo{b}  \n\n  \\bar c\\baz \n\\foo{d}"
+    indices = [[3, 10], [16, 20], [22, 26], [28, 35]]
+
+    ret, placeholders = texplain._apply_placeholders(
+        text, indices, "TEXINDENT", "COMMAND", texplain.PlaceholderType.command
+    )
+
+    expect = text
+    shift = 0
+    for i, (start, end) in enumerate(indices):
+        placeholder, expect = texplain.Placeholder.from_text(
+            f"-TEXINDENT-COMMAND-{i + 1:d}-", expect, start - shift, end - shift
+        )
+        shift += len(placeholder.content) - len(placeholder.placeholder)
+        assert placeholder.content == placeholders[i].content
+        assert placeholder.space_front == placeholders[i].space_front
+        assert placeholder.space_back == placeholders[i].space_back
+
+    assert ret == expect
+    assert texplain.text_from_placeholders(ret, placeholders) == text
+
+
+def test_placeholders_nested():
+    """
+    Restore placeholders that are part of the content of other placeholders.
+    """
+    text = "a \\foo{b % c\n  d} e % f\n\\bar{g}\n"
+
+    ret, placeholders = texplain.text_to_placeholders(
+        text,
+        [
+            texplain.PlaceholderType.inline_comment,
+            texplain.PlaceholderType.command,
+        ],
+    )
+    assert ret == "a -TEXINDENT-COMMAND-1- e -TEXINDENT-INLINE-COMMENT-2-\n-TEXINDENT-COMMAND-2-\n"
+    assert text == texplain.text_from_placeholders(ret, placeholders)
+    assert text == texplain.text_from_placeholders(ret, placeholders[::-1])
+    assert ret == texplain.text_from_placeholders(ret, placeholders, True)
+
+
 def test_placeholders_noindent():
     """
     Replace noindent with placeholders.
@@ -176,6 +221,16 @@ A last sentence.
     assert text == texplain.text_from_placeholders(ret, placeholders)
 
 
+def test_placeholders_math_start():
+    """
+    Text that starts with a placeholder of the same type (from a previous search).
+    """
+    text = r"$a$ b \(c\) d"
+    ret, placeholders = texplain.text_to_placeholders(text, [texplain.PlaceholderType.inline_math])
+    assert ret == "-TEXINDENT-INLINEMATH-1- b -TEXINDENT-INLINEMATH-2- d"
+    assert text == texplain.text_from_placeholders(ret, placeholders)
+
+
 def test_placeholders_command():
     text = r"""
 This is a text \command[foo]{arg1} {arg2} with
@@ -212,3 +267,25 @@ def test_placeholders_command_a():
     ret, placeholders = texplain.text_to_placeholders(text, [texplain.PlaceholderType.command])
     assert ret == expect
     assert text == texplain.text_from_placeholders(ret, placeholders)
+
+
+def test_placeholders_is_placeholder():
+    """
+    Mark all characters of placeholders, only of placeholders that are listed.
+    """
+    text = "a % b\nc % d\ne % f\n"
+    ret, placeholders = texplain.text_to_placeholders(
+        text, [texplain.PlaceholderType.inline_comment]
+    )
+    assert ret.splitlines()[1] == "c -TEXINDENT-INLINE-COMMENT-2-"
+
+    expect = [False] * len(ret)
+    for placeholder in [placeholders[0], placeholders[2]]:
+        start = ret.index(placeholder.placeholder)
+        expect[start : start + len(placeholder.placeholder)] = [True] * len(placeholder.placeholder)
+
+    selection = [placeholders[0], placeholders[2]]
+    spans = texplain._find_placeholders(ret, selection)
+    assert spans.tolist() == [[2, 30], [64, 92]]
+    assert texplain._is_placeholder(ret, selection).tolist() == expect
+    assert texplain._is_placeholder(ret, selection, spans).tolist() == expect
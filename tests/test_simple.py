@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 
 import texplain
 
@@ -12,6 +13,93 @@ def test_find_commented():
     assert indices == [[7, 10]]
 
 
+def test_find_commented_multiple():
+    """
+    Any "%" inside a comment is part of that comment.
+    """
+    text = "a % b % c\nd { e } % f"
+    indices = texplain.find_commented(text)
+    assert indices == [[2, 9], [18, 21]]
+    assert [text[i:j] for i, j in indices] == ["% b % c", "% f"]
+
+
+def test_comment_index():
+    text = "0%2\n4\n%7\n9 % b % c"
+    comments = texplain.CommentIndex.from_text(text)
+    assert comments.tolist() == [[1, 3], [6, 8], [11, 18]]
+    assert comments.is_commented(1)
+    assert not comments.is_commented(3)
+    assert np.all(
+        comments.is_commented([0, 2, 5, 7, 12, 17]) == [False, True, False, True, True, True]
+    )
+    assert comments.overlapping(2, 7).tolist() == [[1, 3], [6, 8]]
+    assert comments.overlapping(3, 6).tolist() == []
+    assert np.all(comments.mask() == texplain.is_commented(text))
+
+
+def test_document_index():
+    text = "\\begin{a}\n{b}\n\\begin{c}\n\\end{c}\n\\end{a} % {}"
+    index = texplain.DocumentIndex(text)
+    assert sorted(texplain.environments(text, index)) == ["a", "c"]
+    assert texplain.find_matching(text, "{", "}", index=index) == texplain.find_matching(
+        text, "{", "}"
+    )
+    assert index.braces is index.matching("{", "}")
+    assert np.all(texplain.is_commented(text, index) == texplain.is_commented(text))
+
+    texplain.DocumentIndex.clear()
+    assert texplain.DocumentIndex.get(text) is texplain.DocumentIndex.get(text)
+    for i in range(texplain.DocumentIndex.maxsize):
+        texplain.DocumentIndex.get(f"{text} {i:d}")
+    assert texplain.DocumentIndex.get(f"{text} {0:d}") is texplain.DocumentIndex.get(
+        f"{text} {0:d}"
+    )
+    assert len(texplain.DocumentIndex._cache) == texplain.DocumentIndex.maxsize
+
+
+def test_find_matching_index():
+    opening = [0, 1, 4, 9]
+    closing = [3, 7, 8, 10]
+    assert texplain.find_matching_index(opening, closing) == {1: 3, 4: 7, 0: 8, 9: 10}
+
+    ret = texplain.find_matching_index(opening, closing, return_array=True)
+    assert np.all(ret == np.array([[1, 3], [4, 7], [0, 8], [9, 10]]))
+
+    with pytest.raises(IndexError):
+        texplain.find_matching_index([0, 1], [2])
+
+    with pytest.raises(IndexError):
+        texplain.find_matching_index([0, 4], [2, 3])
+
+    with pytest.raises(IndexError):
+        texplain.find_matching_index([0, 1, 5], [2, 3, 4])
+
+
+def test_tokens():
+    text = r"\foo{a} \\ \begin{x} \[ $b$ \] \{ % \bar{"
+    tokens = texplain.Tokens(text)
+    expect = [
+        (texplain.TokenType.command, r"\foo", False),
+        (texplain.TokenType.curly_open, "{", False),
+        (texplain.TokenType.curly_close, "}", False),
+        (texplain.TokenType.begin, r"\begin", False),
+        (texplain.TokenType.curly_open, "{", False),
+        (texplain.TokenType.curly_close, "}", False),
+        (texplain.TokenType.display_math_open, r"\[", False),
+        (texplain.TokenType.dollar, "$", False),
+        (texplain.TokenType.dollar, "$", False),
+        (texplain.TokenType.display_math_close, r"\]", False),
+        (texplain.TokenType.comment, "%", True),
+        (texplain.TokenType.command, r"\bar", True),
+        (texplain.TokenType.curly_open, "{", True),
+    ]
+    ret = [
+        (texplain.TokenType(t), text[s:e], c)
+        for t, s, e, c in zip(tokens.ttype, tokens.start, tokens.end, tokens.commented)
+    ]
+    assert ret == expect
+
+
 def test_is_commented():
     """
     Test the is_commented method
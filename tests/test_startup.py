@@ -0,0 +1,85 @@
+import subprocess
+import sys
+import textwrap
+
+
+def _run(code: str) -> str:
+    return subprocess.check_output([sys.executable, "-c", textwrap.dedent(code)], text=True)
+
+
+def test_import():
+    """
+    NumPy is only imported when it is needed.
+    """
+    code = """
+    import sys
+    import texplain
+
+    print("numpy" in sys.modules)
+    """
+    assert _run(code).strip() == "False"
+
+
+def _import_time(modules: str) -> int:
+    """
+    Cumulative import time in microseconds (as reported by ``python -X importtime``).
+    """
+    cmd = [sys.executable, "-X", "importtime", "-c", f"import {modules:s}"]
+    report = subprocess.run(cmd, stderr=subprocess.PIPE, text=True, check=True).stderr
+    report = [line.split("|") for line in report.splitlines()[1:]]
+    # only top-level imports, nested imports are indented
+    return sum(int(cumulative) for _, cumulative, name in report if not name.startswith("  "))
+
+
+def test_import_time():
+    """
+    The import time does not include the import time of NumPy.
+    """
+    code = min(_import_time("texplain") for _ in range(3))
+    numpy = min(_import_time("texplain, numpy") for _ in range(3))
+    assert code < numpy
+
+
+def test_small():
+    """
+    Small inputs are handled without NumPy.
+    """
+    code = r"""
+    import sys
+    import texplain
+
+    assert texplain.find_commented("a % b\nc") == [[2, 5]]
+    assert texplain.find_matching_index([0, 2], [3, 1]) == {0: 1, 2: 3}
+    print("numpy" in sys.modules)
+    """
+    assert _run(code).strip() == "False"
+
+
+def test_cache(tmp_path):
+    """
+    A file that is unchanged since it was formatted is skipped without importing NumPy.
+    """
+    fpath = tmp_path / "test.tex"
+    fpath.write_text("This is a sentence.\nAnd another one.\n")
+    cache = tmp_path / "cache"
+
+    code = f"""
+    import os
+    import sys
+    import texplain
+
+    texplain.texindent_cli(["--cache-dir", r"{cache}", r"{fpath}"])
+    os.utime(r"{fpath}", ns=(10**18, 10**18))
+    texplain.texindent_cli(["--cache-dir", r"{cache}", r"{fpath}"])
+    print("numpy" in sys.modules)
+    """
+    assert _run(code).strip() == "True"
+
+    code = f"""
+    import sys
+    import texplain
+
+    texplain.texindent_cli(["--cache-dir", r"{cache}", r"{fpath}"])
+    print("numpy" in sys.modules)
+    """
+    assert _run(code).strip() == "False"
@@ -1,23 +1,60 @@
+from __future__ import annotations
+
 import argparse
+import bisect
+import concurrent.futures
 import enum
+import functools
+import hashlib
+import inspect
 import itertools
+import json
 import os
 import pathlib
+import queue
 import re
+import socket
+import socketserver
+import stat
 import sys
+import tempfile
 import textwrap
+import threading
+import time
 from collections import defaultdict
+from collections import OrderedDict
+from collections.abc import Iterable
+from collections.abc import Iterator
 from copy import deepcopy
 from shutil import copyfile
-
-import numpy as np
-from numpy.typing import ArrayLike
-from numpy.typing import NDArray
+from typing import TYPE_CHECKING
 
 from ._version import version  # noqa: F401
 from ._version import version_tuple  # noqa: F401
 
 
+class _LazyNumpy:
+    """
+    Import NumPy on first use, such that the import of this module (and formatting that is
+    skipped or that is done without arrays) does not pay for it.
+    After the first use the module replaces this object.
+    """
+
+    def __getattr__(self, name: str):
+        import numpy
+
+        globals()["np"] = numpy
+        return getattr(numpy, name)
+
+
+if TYPE_CHECKING:
+    import numpy as np
+    from numpy.typing import ArrayLike
+    from numpy.typing import NDArray
+else:
+    np = _LazyNumpy()
+
+
 class PlaceholderType(enum.Enum):
     r"""
     Type of placeholder.
@@ -63,7 +100,470 @@ class PlaceholderType(enum.Enum):
     newif_command = enum.auto()
 
 
-def find_commented(text: str) -> list[list[int]]:
+class TokenType(enum.IntEnum):
+    r"""
+    Type of token, see :py:class:`Tokens`.
+
+    -   :py:attr:`newline`: ``\n``.
+    -   :py:attr:`comment`: ``%``.
+    -   :py:attr:`begin`: ``\begin``.
+    -   :py:attr:`end`: ``\end``.
+    -   :py:attr:`command`: Any other command ``\name`` or ``\name*``.
+    -   :py:attr:`inline_math_open`: ``\(``.
+    -   :py:attr:`inline_math_close`: ``\)``.
+    -   :py:attr:`display_math_open`: ``\[``.
+    -   :py:attr:`display_math_close`: ``\]``.
+    -   :py:attr:`dollar`: ``$``.
+    -   :py:attr:`curly_open`, :py:attr:`curly_close`: ``{``, ``}``.
+    -   :py:attr:`square_open`, :py:attr:`square_close`: ``[``, ``]``.
+    -   :py:attr:`round_open`, :py:attr:`round_close`: ``(``, ``)``.
+
+    Except for :py:attr:`newline` all tokens are ignored if they are escaped
+    (i.e. preceded by a backslash).
+    """
+
+    newline = enum.auto()
+    comment = enum.auto()
+    begin = enum.auto()
+    end = enum.auto()
+    command = enum.auto()
+    inline_math_open = enum.auto()
+    inline_math_close = enum.auto()
+    display_math_open = enum.auto()
+    display_math_close = enum.auto()
+    dollar = enum.auto()
+    curly_open = enum.auto()
+    curly_close = enum.auto()
+    square_open = enum.auto()
+    square_close = enum.auto()
+    round_open = enum.auto()
+    round_close = enum.auto()
+
+
+_tokens_regex = re.compile(r"(\n|(?<!\\)(?:\\[a-zA-Z\@]+\*?|\\[\(\)\[\]]|[%\$\{\}\[\]\(\)]))")
+
+# comment: from the first "%" on a line up to (not including) the end of that line
+_comment_regex = re.compile(r"(?<!\\)%[^\n]*")
+
+# below this number of elements arrays are not used
+_small_size = 64
+
+_tokens_symbols = {
+    "\n": TokenType.newline,
+    "%": TokenType.comment,
+    "\\(": TokenType.inline_math_open,
+    "\\)": TokenType.inline_math_close,
+    "\\[": TokenType.display_math_open,
+    "\\]": TokenType.display_math_close,
+    "$": TokenType.dollar,
+    "{": TokenType.curly_open,
+    "}": TokenType.curly_close,
+    "[": TokenType.square_open,
+    "]": TokenType.square_close,
+    "(": TokenType.round_open,
+    ")": TokenType.round_close,
+}
+
+# regex (as used by :py:func:`find_matching`) that corresponds to exactly one type of token
+_tokens_patterns = {
+    re.escape("{"): TokenType.curly_open,
+    re.escape("}"): TokenType.curly_close,
+    re.escape("["): TokenType.square_open,
+    re.escape("]"): TokenType.square_close,
+    re.escape("("): TokenType.round_open,
+    re.escape(")"): TokenType.round_close,
+    re.escape("$"): TokenType.dollar,
+    r"\\\(": TokenType.inline_math_open,
+    r"\\\)": TokenType.inline_math_close,
+    r"\\\[": TokenType.display_math_open,
+    r"\\\]": TokenType.display_math_close,
+}
+
+
+class _TokenTypes(dict):
+    """
+    Lookup of the type of a token as matched by ``_tokens_regex``
+    (value of :py:class:`TokenType`, extended while looking up new commands).
+    """
+
+    def __missing__(self, token: str) -> int:
+        name = token[1:].rstrip("*")
+        if name == "begin":
+            ret = TokenType.begin.value
+        elif name == "end":
+            ret = TokenType.end.value
+        else:
+            ret = TokenType.command.value
+        self[token] = ret
+        return ret
+
+
+_token_types = _TokenTypes({key: value.value for key, value in _tokens_symbols.items()})
+
+
+class CommentIndex:
+    """
+    Index of comments that allows fast lookup.
+    The comments are stored as sorted (non-overlapping) intervals ``[start, end)``,
+    whereby ``start`` is the index of ``%`` and ``end`` the index of the end of the line.
+    Lookups are done by binary search,
+    a per-character array is only constructed on demand (:py:func:`CommentIndex.mask`).
+    To construct from text use :py:func:`CommentIndex.from_text`.
+
+    :param comments: List of ``[start, end]`` of each comment (sorted).
+    :param size: Length of the text.
+    """
+
+    def __init__(self, comments: ArrayLike, size: int):
+        self.comments = np.asarray(comments, dtype=int).reshape(-1, 2)
+        self.start = self.comments[:, 0]
+        self.end = self.comments[:, 1]
+        self.size = size
+
+    @classmethod
+    def from_text(cls, text: str, tokens: "Tokens" = None):
+        """
+        Find comments in text.
+
+        :param text: Text.
+        :param tokens: Tokens of ``text`` (default: computed using :py:class:`Tokens`).
+        """
+        if tokens is None:
+            tokens = Tokens(text)
+        return tokens.comments
+
+    def __len__(self) -> int:
+        return self.comments.shape[0]
+
+    def tolist(self) -> list[list[int]]:
+        """
+        List of ``[start, end]`` of each comment.
+        """
+        return self.comments.tolist()
+
+    def is_commented(self, index: ArrayLike) -> NDArray[np.bool_]:
+        """
+        Check if index (or indices) is part of a comment.
+
+        :param index: Index (or array of indices) in the text.
+        :return: Boolean (or array of booleans of the same shape as ``index``).
+        """
+        index = np.asarray(index, dtype=int)
+        if self.start.size == 0:
+            return np.zeros(index.shape, dtype=bool)
+        i = np.searchsorted(self.start, index, side="right") - 1
+        return np.logical_and(i >= 0, index < self.end[np.maximum(i, 0)])
+
+    def overlapping(self, start: int, end: int) -> NDArray[np.int_]:
+        """
+        Comments that overlap with a range ``[start, end)`` of the text.
+
+        :param start: Start index of the range.
+        :param end: End index of the range.
+        :return: Array ``[[start, end], ...]`` of the overlapping comments.
+        """
+        i = np.searchsorted(self.end, start, side="right")
+        j = np.searchsorted(self.start, end, side="left")
+        return self.comments[i:j]
+
+    def mask(self) -> NDArray[np.bool_]:
+        """
+        Per character if it corresponds to commented text.
+
+        :return: Array of booleans of size ``len(text)``.
+        """
+        change = np.zeros(self.size + 1, dtype=int)
+        change[self.start] = 1
+        change[self.end] = -1
+        return np.cumsum(change[:-1]) > 0
+
+
+class Tokens:
+    r"""
+    Token stream of a text, obtained in a single linear pass.
+    The stream contains commands, brackets, comments, math delimiters, and newlines,
+    see :py:class:`TokenType`.
+    Tokens inside comments are included, but are marked as such.
+    For example::
+
+        tokens = Tokens(text)
+        for ttype, start, end in zip(tokens.ttype, tokens.start, tokens.end):
+            print(TokenType(ttype), text[start:end])
+
+    :param text: Text.
+    """
+
+    def __init__(self, text: str):
+        parts = _split(_tokens_regex, text)
+        offsets = np.cumsum(np.fromiter(map(len, parts), dtype=int, count=len(parts)))
+        tokens = parts[1::2]
+
+        #: Type of each token (value of :py:class:`TokenType`).
+        self.ttype = np.fromiter(
+            map(_token_types.__getitem__, tokens), dtype=np.int8, count=len(tokens)
+        )
+        #: Index of the start of each token.
+        self.start = offsets[0::2][:-1]
+        #: Index of the end of each token.
+        self.end = offsets[1::2]
+        #: Length of the text.
+        self.size = len(text)
+
+        # comment: from the first "%" on a line up to (not including) the end of that line
+        # (any "%" that follows is part of the comment)
+        newlines = self.start[self.ttype == TokenType.newline]
+        percent = self.start[self.ttype == TokenType.comment]
+        line = np.searchsorted(newlines, percent)
+        first = np.ones(percent.size, dtype=bool)
+        first[1:] = line[1:] != line[:-1]
+        #: Comments (``%`` included; newline excluded).
+        self.comments = CommentIndex(
+            np.stack([percent[first], np.append(newlines, len(text))[line[first]]], axis=1),
+            len(text),
+        )
+
+        #: Per token: ``True`` if the token is part of a comment.
+        self.commented = self.comments.is_commented(self.start)
+
+    def find(
+        self, ttype: TokenType, ignore_commented: bool = False, match: int = 0
+    ) -> NDArray[np.int_]:
+        """
+        Find tokens of a certain type.
+
+        :param ttype: Type of token.
+        :param ignore_commented: Ignore tokens that are commented.
+        :param match: Select index of begin (``0``) or end (``1``) of the token.
+        :return: Array of indices.
+        """
+        keep = self.ttype == ttype
+        if ignore_commented:
+            keep = np.logical_and(keep, ~self.commented)
+        if match == 0:
+            return self.start[keep]
+        return self.end[keep]
+
+
+class DocumentIndex:
+    r"""
+    Structures derived from a text that are computed lazily and memoized:
+    :py:class:`Tokens`, :py:class:`CommentIndex`, matching brackets, environments, and labels.
+    As strings are immutable, the index stays valid for as long as the text is used.
+
+    Pass the same index to :py:func:`find_matching`, :py:func:`find_command`,
+    :py:func:`environments`, ... to share these structures between calls.
+    Use :py:func:`DocumentIndex.get` to reuse an index of the same text between independent calls
+    (a bounded number of indices is kept, the least recently used is evicted first).
+
+    :param text: Text.
+    """
+
+    #: Maximum number of indices kept by :py:func:`DocumentIndex.get`.
+    maxsize = 16
+
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, text: str):
+        self.text = text
+        self._tokens = None
+        self._mask = None
+        self._matching = {}
+        self._environments = None
+        self._labels = None
+
+    @classmethod
+    def get(cls, text: str):
+        """
+        Return the index of a text: reuse a previous index of the same text if possible.
+
+        :param text: Text.
+        :return: :py:class:`DocumentIndex`.
+        """
+        key = (len(text), hash(text))
+        with cls._lock:
+            index = cls._cache.get(key)
+            if index is not None and (index.text is text or index.text == text):
+                cls._cache.move_to_end(key)
+                return index
+            index = cls(text)
+            cls._cache[key] = index
+            while len(cls._cache) > cls.maxsize:
+                cls._cache.popitem(last=False)
+        return index
+
+    @classmethod
+    def clear(cls):
+        """
+        Remove all indices kept by :py:func:`DocumentIndex.get`.
+        """
+        with cls._lock:
+            cls._cache.clear()
+
+    @property
+    def tokens(self) -> Tokens:
+        """
+        Tokens, see :py:class:`Tokens`.
+        """
+        if self._tokens is None:
+            self._tokens = Tokens(self.text)
+        return self._tokens
+
+    @property
+    def comments(self) -> CommentIndex:
+        """
+        Comments, see :py:class:`CommentIndex`.
+        """
+        return self.tokens.comments
+
+    @property
+    def is_commented(self) -> NDArray[np.bool_]:
+        """
+        Per character if it corresponds to commented text (read-only).
+        """
+        if self._mask is None:
+            self._mask = self.comments.mask()
+            self._mask.flags.writeable = False
+        return self._mask
+
+    def matching(
+        self,
+        opening: str,
+        closing: str,
+        ignore_escaped: bool = True,
+        ignore_commented: bool = False,
+        escape: bool = True,
+        opening_match: int = 0,
+        closing_match: int = 0,
+    ) -> NDArray[np.int_]:
+        """
+        Matching 'brackets', see :py:func:`find_matching` for the parameters.
+
+        :return: Array ``[[index_opening, index_closing], ...]`` (read-only).
+        """
+        key = (opening, closing, ignore_escaped, ignore_commented, escape)
+        key += (opening_match, closing_match)
+        ret = self._matching.get(key)
+        if ret is None:
+            ret = _find_matching_impl(self, *key)
+            ret.flags.writeable = False
+            self._matching[key] = ret
+        return ret
+
+    @property
+    def braces(self) -> NDArray[np.int_]:
+        """
+        Matching curly braces: array ``[[index_opening, index_closing], ...]`` (read-only).
+        """
+        return self.matching("{", "}")
+
+    @property
+    def environments(self) -> list[str]:
+        """
+        List with present environments, see :py:func:`environments`.
+        """
+        if self._environments is None:
+            self._environments = _environments_impl(self.text, self.braces)
+        return self._environments
+
+    @property
+    def labels(self) -> LabelIndex:
+        """
+        Labels and references, see :py:class:`LabelIndex`.
+        """
+        if self._labels is None:
+            self._labels = LabelIndex(self.text)
+        return self._labels
+
+
+# commands that reference a label (e.g. "\ref{...}", not "\href{...}")
+_ref_commands = [
+    "ref",
+    "eqref",
+    "pageref",
+    "nameref",
+    "autoref",
+    "subref",
+    "vref",
+    "Vref",
+    "cref",
+    "Cref",
+    "cpageref",
+    "Cpageref",
+    "labelcref",
+    "namecref",
+    "nameCref",
+    "lcnamecref",
+]
+
+# label definition or reference: "\label{...}", "\ref{...}", "\cref{...,...}", ...
+_label_regex = re.compile(r"(\\label\{|\\(?:" + "|".join(_ref_commands) + r")\*?\{)([^}]*)\}")
+
+
+def _split_labels(match: re.Match) -> list[str]:
+    r"""
+    Labels of a match of ``_label_regex`` (the labels of a grouped ``\cref{...,...}`` are split).
+
+    :param match: Match.
+    :return: List of labels.
+    """
+    if match.group(1) in ["\\cref{", "\\cref*{"]:
+        return match.group(2).split(",")
+    return [match.group(2)]
+
+
+class LabelIndex:
+    r"""
+    Offsets of the labels in a text: definitions ``\label{...}`` and references ``\ref{...}``,
+    ``\cref{...,...}``, ...
+    The index is built in one scan of the text (use :py:attr:`DocumentIndex.labels` to reuse it,
+    and to build a new index after the text is changed).
+
+    Iterating gives the defined labels in order of (first) appearance.
+
+    :param text: Text.
+    """
+
+    def __init__(self, text: str):
+        #: ``{label: [offset, ...]}`` with the offsets of ``\label{...}``.
+        self.definitions = {}
+        #: ``{label: [offset, ...]}`` with the offsets of the references.
+        self.references = {}
+
+        for match in _finditer(_label_regex, text):
+            if match.group(1) == "\\label{":
+                self.definitions.setdefault(match.group(2), []).append(match.start())
+                continue
+            for label in _split_labels(match):
+                self.references.setdefault(label, []).append(match.start())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.definitions)
+
+    def __len__(self) -> int:
+        return len(self.definitions)
+
+    def __contains__(self, label: str) -> bool:
+        return label in self.definitions
+
+    def duplicates(self) -> list[str]:
+        """
+        Labels that are defined more than once.
+
+        :return: List of labels (in order of appearance).
+        """
+        return [label for label, offsets in self.definitions.items() if len(offsets) > 1]
+
+    def undefined(self) -> list[str]:
+        """
+        Labels that are referenced but not defined.
+
+        :return: List of labels (in order of appearance).
+        """
+        return [label for label in self.references if label not in self.definitions]
+
+
+def find_commented(text: str, index: DocumentIndex = None) -> list[list[int]]:
     """
     Find comments.
 
@@ -73,35 +573,29 @@ def find_commented(text: str) -> list[list[int]]:
             print(text[i : j]) # i is the index of "%"
 
     :param text: Text.
+    :param index: Index of ``text`` to reuse (default: computed).
     :return: List of of indices of the beginning and end of the comments.
     """
 
-    comments = np.array([i.span()[0] for i in re.finditer(r"(?<!\\)(%)", text)])
-    newlines = np.array([i.span()[0] for i in re.finditer(r"\n", text)] + [len(text)])
+    if index is None:
+        return [list(i.span()) for i in _finditer(_comment_regex, text)]
 
-    ret = []
+    return index.comments.tolist()
 
-    for c in comments:
-        j = np.argmax(newlines > c)
-        ret.append([c, newlines[j]])
-        newlines = newlines[j + 1 :]  # noqa: E203
 
-    return ret
-
-
-def is_commented(text: str) -> NDArray[np.bool_]:
+def is_commented(text: str, index: DocumentIndex = None) -> NDArray[np.bool_]:
     """
     Per character if it corresponds to commented text.
 
     :param text: Text.
+    :param index: Index of ``text`` to reuse (default: computed).
     :return: Array of booleans of size ``len(text)``.
     """
 
-    comments = find_commented(text)
-    ret = np.zeros(len(text), dtype=bool)
-    for i, j in comments:
-        ret[i:j] = True
-    return ret
+    if index is None:
+        index = DocumentIndex(text)
+
+    return np.copy(index.is_commented)
 
 
 def find_matching_index(
@@ -113,10 +607,16 @@ def find_matching_index(
     Find matching 'brackets', based on a list of indices corresponding to opening and closing
     'brackets'.
 
+    All brackets are matched at once:
+    the nesting depth follows from a cumulative sum over the sorted brackets,
+    and an opening bracket is matched with the first closing bracket at the same depth.
+
     :param opening: Indices of the opening brackets.
     :param closing: Indices of the closing brackets.
-    :param return_array: If ``True``, return NumPy-array of indices instead of dictionary.
-    :return: Dictionary with ``{index_opening: index_closing}``
+    :param return_array:
+        If ``True``, return NumPy-array of indices ``[[index_opening, index_closing], ...]``
+        instead of dictionary.
+    :return: Dictionary with ``{index_opening: index_closing}`` (ordered by ``index_closing``).
     """
 
     if len(opening) == 0:
@@ -127,33 +627,114 @@ def find_matching_index(
     if len(opening) > len(closing):
         raise IndexError("Unmatching opening...closing found")
 
-    opening = np.array(opening, dtype=int)
-    closing = np.array(closing, dtype=int) * -1
-    brackets = np.concatenate([opening, closing])
-    brackets = brackets[np.argsort(np.abs(brackets))]
+    if len(opening) + len(closing) <= _small_size:
+        pairs = _find_matching_index_small(opening, closing)
+        if return_array:
+            return np.array(pairs, dtype=int).reshape(-1, 2)
+        return dict(pairs)
+
+    opening = np.asarray(opening, dtype=int).ravel()
+    closing = np.asarray(closing, dtype=int).ravel()
+
+    # sort all brackets by position (an opening bracket precedes a closing one at the same index)
+    index = np.concatenate([opening, closing])
+    step = np.concatenate([np.ones(opening.size, dtype=int), -np.ones(closing.size, dtype=int)])
+    sorter = np.argsort(index, kind="stable")
+    index = index[sorter]
+    step = step[sorter]
 
-    ret = {}
+    # depth after each bracket
+    depth = np.cumsum(step)
+
+    if np.any(depth < 0):
+        i = index[np.argmax(depth < 0)]
+        raise IndexError(f"No opening bracket for closing bracket at: {i:d}")
+
+    if depth[-1] != 0:
+        i = index[np.argwhere(np.logical_and(step > 0, depth == 1)).ravel()[-1]]
+        raise IndexError(f"No closing bracket for opening bracket at: {i:d}")
+
+    # level of each pair: depth after an opening bracket and before a closing bracket
+    # at each level the brackets alternate opening, closing, opening, closing, ...
+    level = depth + (step < 0)
+    pairs = index[np.argsort(level, kind="stable")].reshape(-1, 2)
+    pairs = pairs[np.argsort(pairs[:, 1])]
+
+    if return_array:
+        return pairs
+
+    return dict(zip(pairs[:, 0].tolist(), pairs[:, 1].tolist()))
+
+
+def _find_matching_index_small(opening: ArrayLike, closing: ArrayLike) -> list[tuple[int, int]]:
+    """
+    Pure Python implementation of :py:func:`find_matching_index`, for a few brackets.
+
+    :param opening: Indices of the opening brackets.
+    :param closing: Indices of the closing brackets.
+    :return: List ``[(index_opening, index_closing), ...]`` (ordered by ``index_closing``).
+    """
+
+    brackets = sorted([(int(i), 0) for i in opening] + [(int(i), 1) for i in closing])
     stack = []
+    ret = []
 
-    for i in brackets:
-        if i >= 0:
+    for i, is_closing in brackets:
+        if not is_closing:
             stack.append(i)
+        elif len(stack) == 0:
+            raise IndexError(f"No opening bracket for closing bracket at: {i:d}")
         else:
-            if len(stack) == 0:
-                raise IndexError(f"No closing {closing} at: {i:d}")
-            j = stack.pop()
-            ret[j] = -1 * i
+            ret.append((stack.pop(), i))
 
     if len(stack) > 0:
-        i = stack.pop()
-        raise IndexError(f"No opening {opening} at: {i:d}")
-
-    if return_array:
-        return np.array(list(ret.items()), dtype=int).reshape(-1, 2)
+        raise IndexError(f"No closing bracket for opening bracket at: {stack[0]:d}")
 
     return ret
 
 
+def _find_matching_impl(
+    index: DocumentIndex,
+    opening: str,
+    closing: str,
+    ignore_escaped: bool,
+    ignore_commented: bool,
+    escape: bool,
+    opening_match: int,
+    closing_match: int,
+) -> NDArray[np.int_]:
+    """
+    Implementation of :py:func:`find_matching`.
+
+    :return: Array ``[[index_opening, index_closing], ...]``.
+    """
+
+    if escape:
+        opening = re.escape(opening)
+        closing = re.escape(closing)
+
+    if ignore_escaped and opening in _tokens_patterns and closing in _tokens_patterns:
+        tokens = index.tokens
+        a = tokens.find(_tokens_patterns[opening], ignore_commented, opening_match)
+        b = tokens.find(_tokens_patterns[closing], ignore_commented, closing_match)
+        return find_matching_index(a, b, return_array=True)
+
+    if ignore_escaped:
+        opening = r"(?<!\\)" + opening
+        closing = r"(?<!\\)" + closing
+
+    a = [i.span()[opening_match] for i in _finditer(opening, index.text)]
+    b = [i.span()[closing_match] for i in _finditer(closing, index.text)]
+
+    if ignore_commented:
+        a = np.array(a, dtype=int)
+        b = np.array(b, dtype=int)
+        a = a[~index.comments.is_commented(a)]
+        b = b[~index.comments.is_commented(b)]
+
+    return find_matching_index(a, b, return_array=True)
+
+
 def find_matching(
     text: str,
     opening: str,
@@ -164,6 +745,7 @@ def find_matching(
     opening_match: int = 0,
     closing_match: int = 0,
     return_array: bool = False,
+    index: DocumentIndex = None,
 ) -> dict:
     r"""
     Find matching 'brackets'.
@@ -177,127 +759,238 @@ def find_matching(
     :param opening_match: Select index of begin (``0``) or end (``1``) of opening bracket match.
     :param closing_match: Select index of begin (``0``) or end (``1``) of closing bracket match.
     :param return_array: If ``True``, return NumPy-array of indices instead of dictionary.
+    :param index:
+        Index of ``text`` to reuse (default: computed).
+        The result is memoized in the index.
+        If ``opening`` and ``closing`` correspond to a single :py:class:`TokenType`
+        the brackets are taken from the index' :py:class:`Tokens`.
     :return: Dictionary with ``{index_opening: index_closing}``
     """
 
-    if escape:
-        opening = re.escape(opening)
-        closing = re.escape(closing)
+    if index is None:
+        index = DocumentIndex(text)
 
-    if ignore_escaped:
-        opening = r"(?<!\\)" + opening
-        closing = r"(?<!\\)" + closing
-
-    a = [i.span()[opening_match] for i in re.finditer(opening, text)]
-    b = [i.span()[closing_match] for i in re.finditer(closing, text)]
+    ret = index.matching(
+        opening, closing, ignore_escaped, ignore_commented, escape, opening_match, closing_match
+    )
 
-    if ignore_commented:
-        is_comment = is_commented(text)
-        a = np.array(a)
-        b = np.array(b)
-        a = a[~is_comment[a]]
-        b = b[~is_comment[b]]
+    if return_array:
+        return np.copy(ret)
 
-    return find_matching_index(a, b, return_array=return_array)
+    return dict(zip(ret[:, 0].tolist(), ret[:, 1].tolist()))
 
 
-def _detail_find_arg(
-    is_character: NDArray[np.bool_],
-    index: int,
-    braces: ArrayLike,
-    species: ArrayLike,
-    ret: list[tuple[int]],
-) -> list[tuple[int]]:
+def _match_brackets(is_open: ArrayLike) -> NDArray[np.int_]:
     """
-    Nested call (``ret`` is also the return argument).
-    See :py:func:`_find_args` for details.
+    Match brackets of one species that are not necessarily balanced.
+    Closing brackets without opening bracket are ignored.
+
+    :param is_open: Per bracket (sorted by position): ``True`` if it is an opening bracket.
+    :return: Per bracket: the index of the matching bracket (``-1`` if unmatched).
     """
 
-    if len(braces) == 0:
+    is_open = np.asarray(is_open, dtype=bool)
+    index = np.arange(is_open.size)
+    ret = -1 * np.ones(is_open.size, dtype=int)
+
+    try:
+        pairs = find_matching_index(index[is_open], index[~is_open], return_array=True)
+    except IndexError:
+        stack = []
+        for i, o in enumerate(is_open.tolist()):
+            if o:
+                stack.append(i)
+            elif len(stack) > 0:
+                j = stack.pop()
+                ret[i] = j
+                ret[j] = i
         return ret
 
-    if braces[0] < 0:
-        return ret
+    ret[pairs[:, 0]] = pairs[:, 1]
+    ret[pairs[:, 1]] = pairs[:, 0]
+    return ret
 
-    if np.any(is_character[index : braces[0]]) and braces[0] - index > 1:
-        return ret
 
-    stack = []
+def _find_args(
+    text: str,
+    cmd_start: ArrayLike,
+    cmd_end: ArrayLike,
+    is_comment: NDArray[np.bool_],
+    tokens: Tokens,
+    token_comment: NDArray[np.bool_],
+    max_options: ArrayLike = None,
+    max_arguments: ArrayLike = None,
+) -> list[list[tuple[int]]]:
+    """
+    Find sequence of matching brackets following commands.
+    For example::
 
-    keep = species == species[0]
-    mybraces = braces[keep]
-    myindex = np.arange(len(braces))[keep]
+        \\foo[...]{...}
 
-    if len(mybraces) < 2:
-        return ret
+    would correspond to::
 
-    for i, trial in enumerate(mybraces):
-        trial = mybraces[i]
-        if trial >= 0:
-            stack.append(trial)
-        else:
-            if len(stack) == 0:
-                raise IndexError(f"No closing closing bracket at for {index:d}")
-            opening = stack.pop()
-            if len(stack) == 0:
-                closing = -1 * trial
-                break
+        [(0, 4), (4, 9), (9, 14)]
 
-    return _detail_find_arg(
-        is_character,
-        closing + 1,
-        braces[myindex[i] + 1 :],
-        species[myindex[i] + 1 :],
-        ret + [(opening, closing + 1)],
+    The sequence is abandoned if a closing bracket is not following by an opening bracket,
+    if the opening bracket is not matched,
+    or if there is anything else than whitespace and comments in between.
+    All brackets are matched once, whereafter the sequence of each command is found by
+    walking forward from the end of the command.
+
+    :param text: Text.
+    :param cmd_start: Start index of each command (sorted).
+    :param cmd_end: End index of each command.
+    :param is_comment: Per character, ``True`` if the character is part of a comment.
+    :param tokens: Tokens of ``text``.
+    :param token_comment: Per token, ``True`` if the token is part of a comment.
+    :param max_options: Per command: the maximum number of options ``[...]`` (``-1``: no limit).
+    :param max_arguments: Per command: the maximum number of arguments ``{...}`` (``-1``: no limit).
+    :return: Per command: list of tuples with indices of the command and of its options/arguments.
+    """
+
+    ncmd = len(cmd_start)
+
+    # all brackets that are not commented (sorted by position)
+    keep = np.isin(
+        tokens.ttype,
+        [
+            TokenType.square_open,
+            TokenType.square_close,
+            TokenType.curly_open,
+            TokenType.curly_close,
+        ],
     )
+    keep = np.logical_and(keep, ~token_comment)
+    ttype = tokens.ttype[keep]
+    position = tokens.start[keep]
+    is_open = np.logical_or(ttype == TokenType.square_open, ttype == TokenType.curly_open)
+    is_option = np.logical_or(ttype == TokenType.square_open, ttype == TokenType.square_close)
+
+    # index of the matching bracket of each bracket
+    partner = -1 * np.ones(position.size, dtype=int)
+    for species in [is_option, ~is_option]:
+        index = np.argwhere(species).ravel()
+        match = _match_brackets(is_open[index])
+        partner[index[match >= 0]] = index[match[match >= 0]]
+
+    # number of characters that are not a comment or a space/newline, preceding each index
+    code = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    is_character = ~np.logical_or(is_comment, np.isin(code, [32, 10]))
+    nchar = np.concatenate([[0], np.cumsum(is_character)]).tolist()
+
+    if max_options is None:
+        max_options = -1 * np.ones(ncmd, dtype=int)
+    if max_arguments is None:
+        max_arguments = -1 * np.ones(ncmd, dtype=int)
+
+    first = np.searchsorted(position, cmd_end).tolist()
+    position = position.tolist()
+    is_open = is_open.tolist()
+    is_option = is_option.tolist()
+    partner = partner.tolist()
+    nbrackets = len(position)
 
+    ret = []
 
-def _find_args(
-    is_character: NDArray[np.bool_],
-    index: int,
-    brackets: dict[ArrayLike],
-) -> list[int]:
-    """
-    Find sequence of matching brackets.
-    For example::
+    for start, end, k, nopt, narg in zip(
+        np.asarray(cmd_start).tolist(),
+        np.asarray(cmd_end).tolist(),
+        first,
+        np.asarray(max_options).tolist(),
+        np.asarray(max_arguments).tolist(),
+    ):
+        item = [(start, end)]
+        index = end
 
-        [...]{...}
+        while k < nbrackets:
+            opening = position[k]
+            if not is_open[k]:
+                break
+            if nchar[opening] - nchar[index] > 0 and opening - index > 1:
+                break
+            if is_option[k]:
+                if nopt == 0:
+                    break
+                nopt -= 1
+            else:
+                if narg == 0:
+                    break
+                narg -= 1
+            j = partner[k]
+            if j < 0:
+                break
+            index = position[j] + 1
+            item.append((opening, index))
+            k = j + 1
 
-    would correspond to::
+        ret.append(item)
 
-        >>> _find_args([1 1 1 1 1 1 1 1], 0, brackets={"[": [0], "]": [4], "{": [5], "}": [9]})
-        [(0, 4), (5, 9)]
+    return ret
 
-    The sequence is abandoned if a closing bracket is not following by an opening bracket,
-    or if the opening bracket is not matched.
 
-    :param is_character: Per character, ``True`` if the character is not a space/newline/comment.
-    :param index: Index from where to start searching.
-    :param brackets: Dictionary with e.g. ``{"{": [indices], "}": [indices], ...}``.
-    :return: List of tuples with indices of opening and closing brackets of the options.
+def _find_command_impl(
+    text: str,
+    cmd_start: ArrayLike,
+    cmd_end: ArrayLike,
+    is_comment: list[bool],
+    index: DocumentIndex,
+    max_options: ArrayLike = None,
+    max_arguments: ArrayLike = None,
+) -> list[list[tuple[int]]]:
     """
+    Find options and arguments of commands that are not commented.
+    See :py:func:`find_command` for details.
 
-    if len(brackets) == 0:
-        return []
+    :param text: Text.
+    :param cmd_start: Start index of each command (sorted).
+    :param cmd_end: End index of each command.
+    :param is_comment: Per character of ``text``, ``True`` if the character is part of a comment.
+    :param index: Index of ``text``.
+    :param max_options: Per command: the maximum number of options ``[...]`` (``-1``: no limit).
+    :param max_arguments: Per command: the maximum number of arguments ``{...}`` (``-1``: no limit).
+    :return: See :py:func:`find_command`.
+    """
+
+    if is_comment is None:
+        is_comment = index.is_commented
+        token_comment = index.tokens.commented
+    else:
+        is_comment = np.asarray(is_comment, dtype=bool)
+        token_comment = is_comment[index.tokens.start]
+
+    # ignore any match inside comments
+    cmd_start = np.asarray(cmd_start, dtype=int)
+    keep = ~is_comment[cmd_start]
+
+    if max_options is not None:
+        max_options = np.asarray(max_options, dtype=int)[keep]
+    if max_arguments is not None:
+        max_arguments = np.asarray(max_arguments, dtype=int)[keep]
+
+    return _find_args(
+        text,
+        cmd_start[keep],
+        np.asarray(cmd_end, dtype=int)[keep],
+        is_comment,
+        index.tokens,
+        token_comment,
+        max_options,
+        max_arguments,
+    )
 
-    species = []
-    braces = []
-    for s, (o, c) in enumerate([("(", ")"), ("[", "]"), ("{", "}")]):
-        b = list(brackets.pop(o, [])) + [-i for i in brackets.pop(c, [])]
-        species += [s + 1] * len(b)
-        braces += b
-    species = np.array(species)
-    braces = np.array(braces)
-    sorter = np.argsort(np.abs(braces))
-    return _detail_find_arg(is_character, index, braces[sorter], species[sorter], [])
+
+# regex of any command, commands matching it are found from the tokens (without a search)
+_command_regex = r"(?<!\\)(\\)([a-zA-Z\@]+)(\*?)"
 
 
-# TODO: This function should be able to be limited to a given number of options and arguments.
 def find_command(
     text: str,
     name: str = None,
-    regex: str = r"(?<!\\)(\\)([a-zA-Z\@]+)(\*?)",
+    regex: str = _command_regex,
     is_comment: list[bool] = None,
+    index: DocumentIndex = None,
+    max_options: int = None,
+    max_arguments: int = None,
 ) -> list[list[tuple[int]]]:
     """
     Find indices of commands, and their options, and arguments.
@@ -307,12 +1000,17 @@ def find_command(
     -   Word
     -   Any number of matching ``[]`` and ``{}`` (in any order).
 
+    To search for several commands at once use :py:func:`find_commands`.
+
     :param text: Text.
     :param name: Name of command without backslash (e.g. ``"textbf"``).
     :param regex: Regex to match search the command name.
     :param is_comment:
         Per character of ``text``, ``True`` if the character is part of a comment.
-        Default: search for comments using :py:func:`is_commented`.
+        Default: search for comments using :py:class:`Tokens`.
+    :param index: Index of ``text`` to reuse (default: computed).
+    :param max_options: Maximum number of options ``[...]`` to search (default: no limit).
+    :param max_arguments: Maximum number of arguments ``{...}`` to search (default: no limit).
 
     :return: List of indices of commands and their arguments:
         ``[[(name_start, name_end), (arg1_start, arg1_end), ...], ...]``
@@ -320,57 +1018,118 @@ def find_command(
         command as follows: ``text[cmd[i][j][0]:cmd[i][j][1]]``.
     """
 
+    if len(text) == 0:
+        return []
+
+    if index is None:
+        index = DocumentIndex(text)
+
+    tokens = index.tokens
+
     if name is not None:
         regex = r"(?<!\\)(\\)" + re.escape(name)
 
-    if is_comment is None:
-        is_comment = is_commented(text)
+    if regex == _command_regex:
+        keep = np.isin(tokens.ttype, [TokenType.command, TokenType.begin, TokenType.end])
+        cmd_start = tokens.start[keep]
+        cmd_end = tokens.end[keep]
+    else:
+        cmd_start = []
+        cmd_end = []
+        for i in _finditer(regex, text):
+            cmd_start.append(i.span()[0])
+            cmd_end.append(i.span()[1])
+
+    if len(cmd_start) == 0:
+        return []
+
+    n = len(cmd_start)
+    return _find_command_impl(
+        text,
+        cmd_start,
+        cmd_end,
+        is_comment,
+        index,
+        None if max_options is None else np.full(n, max_options),
+        None if max_arguments is None else np.full(n, max_arguments),
+    )
+
+
+def find_commands(
+    text: str,
+    names: list[str],
+    max_options: dict[str, int] = None,
+    max_arguments: dict[str, int] = None,
+    is_comment: list[bool] = None,
+    index: DocumentIndex = None,
+) -> dict[str, list[list[tuple[int]]]]:
+    r"""
+    Find indices of several commands, and their options, and arguments, in one pass.
+    For example::
+
+        find_commands(text, ["section", "label"], max_arguments={"section": 1, "label": 1})
 
-    is_comment = np.append(is_comment, is_comment[-1])  # convention: end of range index used
+    returns::
 
-    cmd_start = []
-    cmd_end = []
+        {
+            "section": [[(name_start, name_end), (arg1_start, arg1_end)], ...],
+            "label": [[(name_start, name_end), (arg1_start, arg1_end)], ...],
+        }
+
+    See :py:func:`find_command` for details.
+
+    :param text: Text.
+    :param names: Names of the commands without backslash (e.g. ``["textbf", "section*"]``).
+    :param max_options:
+        Maximum number of options ``[...]`` to search (default: no limit).
+        Either a number for all commands, or a dictionary ``{name: number}``.
+    :param max_arguments:
+        Maximum number of arguments ``{...}`` to search (default: no limit).
+        Either a number for all commands, or a dictionary ``{name: number}``.
+    :param is_comment:
+        Per character of ``text``, ``True`` if the character is part of a comment.
+        Default: search for comments using :py:class:`Tokens`.
+    :param index: Index of ``text`` to reuse (default: computed).
+    :return: Dictionary ``{name: [[(name_start, name_end), (arg1_start, arg1_end), ...], ...]}``.
+    """
+
+    ret = {name: [] for name in names}
+
+    if len(text) == 0:
+        return ret
 
-    for i in re.finditer(regex, text):
-        cmd_start.append(i.span()[0])
-        cmd_end.append(i.span()[1])
+    if index is None:
+        index = DocumentIndex(text)
+
+    tokens = index.tokens
+
+    keep = np.isin(tokens.ttype, [TokenType.command, TokenType.begin, TokenType.end])
+    cmd_start = tokens.start[keep]
+    cmd_end = tokens.end[keep]
+    cmd_name = np.array([text[i + 1 : j] for i, j in zip(cmd_start, cmd_end)], dtype=object)
+    keep = np.isin(cmd_name, list(names))
+    cmd_start = cmd_start[keep]
+    cmd_end = cmd_end[keep]
+    cmd_name = cmd_name[keep]
 
     if len(cmd_start) == 0:
-        return []
+        return ret
 
-    # find brackets
-    brackets = {
-        "[": np.array([i.span()[0] for i in re.finditer(r"(?<!\\)(\[)", text)]),
-        "]": np.array([i.span()[0] for i in re.finditer(r"(?<!\\)(\])", text)]),
-        "{": np.array([i.span()[0] for i in re.finditer(r"(?<!\\)(\{)", text)]),
-        "}": np.array([i.span()[0] for i in re.finditer(r"(?<!\\)(\})", text)]),
-    }
+    limits = []
+    for limit in [max_options, max_arguments]:
+        if limit is None:
+            limits.append(None)
+        elif isinstance(limit, dict):
+            limits.append([limit.get(name, -1) for name in cmd_name])
+        else:
+            limits.append(np.full(cmd_name.size, limit))
 
-    # ignore any match inside comments
-    cmd_start = np.array(cmd_start)
-    cmd_end = np.array(cmd_end)[~is_comment[cmd_start]]
-    cmd_start = cmd_start[~is_comment[cmd_start]]
-    for key, value in brackets.items():
-        if value.size > 0:
-            brackets[key] = value[~is_comment[value]]
-
-    # per character: True if character is not a comment or a space/newline
-    is_character = ~np.logical_or(is_comment, [i == " " or i == "\n" for i in text] + [False])
-
-    # search to which command brackets might belong
-    # this is a rough estimate as commands might be nested
-    cmd_brackets = {
-        key: np.searchsorted(cmd_end, value, side="right") - 1 for key, value in brackets.items()
-    }
+    is_comment = None if is_comment is None else np.asarray(is_comment, dtype=bool)
+    commands = _find_command_impl(text, cmd_start, cmd_end, is_comment, index, *limits)
+
+    for command in commands:
+        ret[text[command[0][0] + 1 : command[0][1]]].append(command)
 
-    ret = []
-    for icmd in range(len(cmd_end)):
-        ibrackets = {key: brackets[key][value >= icmd] for key, value in cmd_brackets.items()}
-        item = [(cmd_start[icmd], cmd_end[icmd])]
-        args = _find_args(is_character, index=cmd_end[icmd], brackets=ibrackets)
-        if len(args) > 0:
-            item += args
-        ret += [item]
     return ret
 
 
@@ -387,9 +1146,17 @@ def remove_comments(text: str) -> str:
     return "\n".join(text)
 
 
-def _environments_impl(text: str, curly_braces: dict) -> list[str]:
+def _environments_impl(text: str, curly_braces: ArrayLike) -> list[str]:
+    """
+    Implementation of :py:func:`environments`.
+
+    :param text: Text.
+    :param curly_braces: Matching curly braces ``[[index_opening, index_closing], ...]``.
+    :return: List of environment names.
+    """
+    curly_braces = dict(zip(curly_braces[:, 0].tolist(), curly_braces[:, 1].tolist()))
     ret = []
-    for i in re.finditer(r"\\begin{.*}", text):
+    for i in _finditer(r"\\begin{.*}", text):
         opening = i.span(0)[0] + 6
         closing = curly_braces[opening]
         i = opening + 1
@@ -397,13 +1164,18 @@ def _environments_impl(text: str, curly_braces: dict) -> list[str]:
     return list(set(ret))
 
 
-def environments(text: str) -> list[str]:
+def environments(text: str, index: DocumentIndex = None) -> list[str]:
     r"""
     Return list with present environments.
     This corresponds to the text between ``\begin{...}`` and ``\end{...}``.
+
+    :param text: Text.
+    :param index: Index of ``text`` to reuse (default: computed).
+    :return: List of environment names.
     """
-    braces = find_matching(text, "{", "}", ignore_escaped=True)
-    return _environments_impl(text=text, curly_braces=braces)
+    if index is None:
+        index = DocumentIndex(text)
+    return list(index.environments)
 
 
 class Placeholder:
@@ -468,6 +1240,11 @@ class Placeholder:
         post = text[end:]
         front = re.search(r"\s*", pre).end()
         back = re.search(r"\ *\n?", post).end()
+        ret = text[:start] + placeholder + text[end:]
+        counters = PerformanceCounters._active()
+        if counters is not None:
+            counters.add_placeholders(ptype, 1)
+            counters.copied += len(ret)
         return (
             Placeholder(
                 placeholder,
@@ -477,7 +1254,7 @@ class Placeholder:
                 ptype,
                 search_placeholder,
             ),
-            text[:start] + placeholder + text[end:],
+            ret,
         )
 
     def to_text(self, text: str, index: int = None, keep_placeholder: bool = False) -> str:
@@ -511,9 +1288,12 @@ class Placeholder:
             post = self.space_back + post[back:]
 
         if keep_placeholder:
-            return pre + self.placeholder + post
+            ret = pre + self.placeholder + post
+        else:
+            ret = pre + self.content + post
 
-        return pre + self.content + post
+        _count_copy(ret)
+        return ret
 
     def __repr__(self) -> str:
         return self.placeholder
@@ -556,25 +1336,28 @@ class GeneratePlaceholder:
         return f"-{self.base}-{self.name}-\\d+-"
 
 
-def _filter_nested(indices: ArrayLike) -> ArrayLike:
+_space_back = re.compile(r"\ *\n?")
+
+
+def _filter_nested(indices: ArrayLike) -> list[list[int]]:
     """
     Filter nested indices.
 
-    :param indices: A list of start and end indices.
-    :return: The filtered list of start and end indices.
+    :param indices: A list (or array) of start and end indices.
+    :return: The filtered list of start and end indices, sorted by start index.
     """
 
-    indices = indices[np.argsort(indices[:, 0])]
-    keep = np.ones(len(indices), dtype=bool)
+    if hasattr(indices, "tolist"):
+        indices = indices.tolist()
 
+    ret = []
     last = 0
-    for i in range(len(indices)):
-        if indices[i, 0] < last:
-            keep[i] = False
-        else:
-            last = indices[i, 1]
+    for start, end in sorted(indices, key=lambda i: i[0]):
+        if start >= last:
+            ret.append([start, end])
+            last = end
 
-    return indices[keep]
+    return ret
 
 
 def _apply_placeholders(
@@ -590,7 +1373,9 @@ def _apply_placeholders(
     Replace text with placeholders.
 
     :param text: Text to consider.
-    :param indices: A list of start and end indices of the text to be replaced by a placeholder.
+    :param indices:
+        A list of start and end indices of the text to be replaced by a placeholder.
+        Without ``filter_nested`` they must be sorted and non-overlapping.
     :param base: The base of the placeholder, see :py:class:`GeneratePlaceholder`.
     :param name: The name of the placeholder, see :py:class:`GeneratePlaceholder`.
     :param ptype: The type of placeholder, see :py:class:`PlaceholderType`.
@@ -608,28 +1393,52 @@ def _apply_placeholders(
     if len(indices) == 0:
         return text, []
 
-    indices = np.array(indices, dtype=int).reshape(-1, 2)
-
     if filter_nested:
         indices = _filter_nested(indices)
+    elif hasattr(indices, "tolist"):
+        indices = indices.tolist()
 
     gen = GeneratePlaceholder(base, name, start)
     search_placeholder = gen.search_placeholder
-    assert re.match(search_placeholder, text) is None
+    assert start > 0 or re.match(search_placeholder, text) is None
 
+    # build the new text in one pass, see Placeholder.from_text for the whitespace bookkeeping
+    # (the whitespace before a placeholder never extends beyond the previous placeholder)
     ret = []
-    for i in range(indices.shape[0]):
-        placeholder, text = Placeholder.from_text(
-            gen(), text, indices[i, 0], indices[i, 1], ptype, search_placeholder
+    parts = []
+    last = 0
+    for start, end in indices:
+        pre = text[last:start]
+        back = _space_back.match(text, end).end()
+        placeholder = Placeholder(
+            gen(),
+            text[start:end],
+            pre[len(pre.rstrip()) :],  # noqa: E203
+            text[end:back],
+            ptype,
+            search_placeholder,
         )
+        parts += [pre, placeholder.placeholder]
         ret += [placeholder]
-        indices -= len(placeholder.content) - len(placeholder.placeholder)
+        last = end
+
+    parts += [text[last:]]
+    text = "".join(parts)
+
+    counters = PerformanceCounters._active()
+    if counters is not None:
+        counters.add_placeholders(ptype, len(ret))
+        counters.copied += len(text)
 
     return text, ret
 
 
 def _detail_text_to_placholders(
-    text: str, ptype: PlaceholderType, base: str, placeholders_comments
+    text: str,
+    ptype: PlaceholderType,
+    base: str,
+    placeholders_comments,
+    comments: ArrayLike = None,
 ) -> tuple[str, list[Placeholder]]:
     """
     Replace text with a specific placeholder type.
@@ -638,6 +1447,7 @@ def _detail_text_to_placholders(
     :param ptype: The type of placeholder, see :py:class:`PlaceholderType`.
     :param base: The base of the placeholder, see :py:class:`GeneratePlaceholder`.
     :param placeholders_comments: A list comment placeholders.
+    :param comments: Comment placeholders in ``text``, see :py:func:`_find_placeholders`.
     :return:
         ``(text, placeholders)`` where:
         - ``text`` is the text with the placeholders.
@@ -689,11 +1499,11 @@ def _detail_text_to_placholders(
         return _apply_placeholders(text, indices, base, "tabular".upper(), ptype)
 
     if ptype == PlaceholderType.inline_comment:
-        indices = [i.span(2) for i in re.finditer(r"([^\ ][\ ]*)(?<!\\)(%.*)", text)]
+        indices = [i.span(2) for i in _finditer(r"([^\ ][\ ]*)(?<!\\)(%.*)", text)]
         return _apply_placeholders(text, indices, base, "inline-comment".upper(), ptype, False)
 
     if ptype == PlaceholderType.comment:
-        indices = [i.span(3) for i in re.finditer(r"(^|\n)(\ *)(?<!\\)(%.*)", text)]
+        indices = [i.span(3) for i in _finditer(r"(^|\n)(\ *)(?<!\\)(%.*)", text)]
         return _apply_placeholders(text, indices, base, "comment".upper(), ptype, False)
 
     if ptype == PlaceholderType.environment:
@@ -738,7 +1548,7 @@ def _detail_text_to_placholders(
         name = "inlinemath".upper()
         pattern = r"(?<!\\)(\$)"
         indices = []
-        for i in re.finditer(pattern, text):
+        for i in _finditer(pattern, text):
             indices.append(i.span()[0])
         indices = np.array(indices, dtype=int).reshape((-1, 2))
         indices[:, 1] += 1
@@ -770,7 +1580,7 @@ def _detail_text_to_placholders(
 
     if ptype == PlaceholderType.command or ptype == PlaceholderType.command_like:
         if placeholders_comments is not None:
-            is_comment = _is_placeholder(text, placeholders_comments)
+            is_comment = _is_placeholder(text, placeholders_comments, comments)
             components = find_command(text, is_comment=is_comment)
         else:
             components = find_command(text)
@@ -795,7 +1605,7 @@ def _detail_text_to_placholders(
     if ptype == PlaceholderType.let_command:
         regex = r"(?<!\\)(\\let)((\\[\w\@\*]*))*"
         if placeholders_comments is not None:
-            is_comment = _is_placeholder(text, placeholders_comments)
+            is_comment = _is_placeholder(text, placeholders_comments, comments)
             components = find_command(text, is_comment=is_comment, regex=regex)
         else:
             components = find_command(text, regex=regex)
@@ -809,7 +1619,7 @@ def _detail_text_to_placholders(
     if ptype == PlaceholderType.newif_command:
         regex = r"(?<!\\)(\\newif)((\\[\w\@\*]*))*"
         if placeholders_comments is not None:
-            is_comment = _is_placeholder(text, placeholders_comments)
+            is_comment = _is_placeholder(text, placeholders_comments, comments)
             components = find_command(text, is_comment=is_comment, regex=regex)
         else:
             components = find_command(text, regex=regex)
@@ -1057,14 +1867,84 @@ def text_to_placeholders(
     """
 
     ret = []
+    comments = None
+    commands = [
+        PlaceholderType.command,
+        PlaceholderType.command_like,
+        PlaceholderType.let_command,
+        PlaceholderType.newif_command,
+    ]
 
     for ptype in ptypes:
-        text, placeholders = _detail_text_to_placholders(text, ptype, base, placeholders_comments)
+        # search comments only once for as long as the text does not change
+        if placeholders_comments is not None and comments is None and ptype in commands:
+            comments = _find_placeholders(text, placeholders_comments)
+        text, placeholders = _detail_text_to_placholders(
+            text, ptype, base, placeholders_comments, comments
+        )
         ret += placeholders
+        if len(placeholders) > 0:
+            comments = None
 
     return text, ret
 
 
+def _rstrip_parts(parts: list[str]):
+    """
+    Remove trailing whitespace from text that is stored as a list of parts (in-place).
+
+    :param parts: List of strings.
+    """
+    while len(parts) > 0:
+        stripped = parts[-1].rstrip()
+        if len(stripped) > 0:
+            parts[-1] = stripped
+            return
+        parts.pop()
+
+
+def _restore_placeholders(
+    text: str, search: re.Pattern, placeholders: dict, keep_placeholders: bool
+) -> tuple[str, int]:
+    """
+    Replace all placeholders found in one scan of the text.
+    The whitespace is modified as in :py:func:`Placeholder.to_text`.
+
+    :param text: Text with placeholders.
+    :param search: Regex that matches all placeholders.
+    :param placeholders: ``{placeholder: Placeholder}``, replaced placeholders are removed.
+    :param keep_placeholders: If ``True``, the placeholders are kept (they are merely positioned).
+    :return: ``(text, n)`` with ``n`` the number of replaced placeholders.
+    """
+    parts = []
+    last = 0
+    n = 0
+
+    for match in _finditer(search, text):
+        placeholder = placeholders.pop(match.group(), None)
+        if placeholder is None:
+            continue
+        start, end = match.span()
+        parts += [text[last:start]]
+        if placeholder.space_front is not None:
+            _rstrip_parts(parts)
+            parts += [placeholder.space_front]
+        parts += [placeholder.placeholder if keep_placeholders else placeholder.content]
+        last = end
+        if placeholder.space_back is not None:
+            last = _space_back.match(text, end).end()
+            parts += [placeholder.space_back]
+        n += 1
+
+    if n == 0:
+        return text, 0
+
+    parts += [text[last:]]
+    text = "".join(parts)
+    _count_copy(text)
+    return text, n
+
+
 def text_from_placeholders(
     text: str,
     placeholders: list[Placeholder],
@@ -1084,31 +1964,19 @@ def text_from_placeholders(
     if len(placeholders) == 0:
         return text
 
-    search_placeholder = []
-
-    if len(placeholders) > 1:
-        search_placeholder = list(set(list({i.search_placeholder for i in placeholders})))
-
+    search = sorted({i.search_placeholder for i in placeholders if i.search_placeholder})
     placeholders = {i.placeholder: i for i in placeholders}
 
-    for search in search_placeholder:
-        if search is None:
-            continue
-        indices = {text[i.span()[0] : i.span()[1]]: i.span()[0] for i in re.finditer(search, text)}
-        offset = 0
-        for key, index in indices.items():
-            placeholder = placeholders.pop(key, None)
-            if placeholder is None:
-                continue
-            n = len(text)
-            text = placeholder.to_text(text, index + offset, keep_placeholder=keep_placeholders)
-            offset += len(text) - n
-            if len(placeholders) == 0:
-                return text
-
-    for key in placeholders:
-        placeholder = placeholders[key]
-        n = len(text)
+    # all placeholders are replaced in one scan,
+    # rescan only for placeholders that were part of the content of another placeholder
+    if len(search) > 0:
+        search = re.compile("|".join(f"(?:{i})" for i in search))
+        while len(placeholders) > 0:
+            text, n = _restore_placeholders(text, search, placeholders, keep_placeholders)
+            if n == 0:
+                break
+
+    for placeholder in placeholders.values():
         text = placeholder.to_text(text, keep_placeholder=keep_placeholders)
 
     return text
@@ -1225,33 +2093,47 @@ def _align(text: str, placeholders: dict[list[Placeholder]] = {}, maxwidth: int
     return "\n".join(lines)
 
 
-def _is_placeholder(text: str, placeholders: list[Placeholder]) -> list[bool]:
+def _find_placeholders(text: str, placeholders: list[Placeholder]) -> NDArray[np.int_]:
     """
-    Check per character if it is a placeholder.
+    Find placeholders in a text (in one scan).
+    Placeholders without :py:attr:`Placeholder.search_placeholder` are not searched.
 
     :param text: Text.
     :param placeholders: List of placeholders.
-    :return: List of booleans.
+    :return: Array ``[[index_start, index_end], ...]`` of the placeholders in ``text``.
     """
 
-    search_placeholder = list(set(list({i.search_placeholder for i in placeholders})))
+    search = sorted({i.search_placeholder for i in placeholders if i.search_placeholder})
 
-    ret = {}
+    if len(search) == 0:
+        return np.zeros((0, 2), dtype=int)
 
-    for search in search_placeholder:
-        if search is None:
-            continue
-        indices = {text[i.span()[0] : i.span()[1]]: i.span()[0] for i in re.finditer(search, text)}
-        ret.update(indices)
+    names = {i.placeholder for i in placeholders}
+    search = "|".join(f"(?:{i})" for i in search)
+    ret = [i.span() for i in _finditer(search, text) if i.group() in names]
+    return np.array(ret, dtype=int).reshape(-1, 2)
+
+
+def _is_placeholder(
+    text: str, placeholders: list[Placeholder], spans: ArrayLike = None
+) -> NDArray[np.bool_]:
+    """
+    Check per character if it is a placeholder.
 
-    names = [i.placeholder for i in placeholders]
-    ret = {key: value for key, value in ret.items() if key in names}
+    :param text: Text.
+    :param placeholders: List of placeholders.
+    :param spans: Output of :py:func:`_find_placeholders` to reuse (default: computed).
+    :return: List of booleans.
+    """
 
-    is_comment = np.zeros(len(text), dtype=bool)
-    for i in ret:
-        is_comment[ret[i] : ret[i] + len(i)] = True
+    if spans is None:
+        spans = _find_placeholders(text, placeholders)
 
-    return is_comment
+    spans = np.asarray(spans, dtype=int).reshape(-1, 2)
+    ret = np.zeros(len(text) + 1, dtype=int)
+    np.add.at(ret, spans[:, 0], 1)
+    np.add.at(ret, spans[:, 1], -1)
+    return np.cumsum(ret[:-1]) > 0
 
 
 def _begin_end_one_separate_line(text: str, comment_placeholders: list[Placeholder]) -> str:
@@ -1273,49 +2155,55 @@ def _begin_end_one_separate_line(text: str, comment_placeholders: list[Placehold
     """
 
     # begin all ``\begin{...}``and ``\end{...}`` on newline
-    text = re.sub(r"(\n?\ *)(?<!\\)(\\(begin|end)\{)", r"\n\2", text)
+    text = _sub(r"(\n?\ *)(?<!\\)(\\(begin|end)\{)", r"\n\2", text)
 
     # begin all ``\[`` and ``\]`` on newline
-    text = re.sub(r"(\n?\ *)(?<!\\)(\\(\[|\]))", r"\n\2", text)
+    text = _sub(r"(\n?\ *)(?<!\\)(\\(\[|\]))", r"\n\2", text)
 
     # begin all ``\if`` and ``\else`` and ``\fi`` on newline
-    text = re.sub(r"(\n?\ *)(?<!\\)(\\if[\@\w]*)(?=\s|\n|$)", r"\n\2", text)
-    text = re.sub(r"(\n?\ *)(?<!\\)(\\fi)(?=\s|\n|$)", r"\n\2", text)
-    text = re.sub(r"(\n?\ *)(?<!\\)(\\else)(?=\s|\n|$)", r"\n\2", text)
+    text = _sub(r"(\n?\ *)(?<!\\)(\\if[\@\w]*)(?=\s|\n|$)", r"\n\2", text)
+    text = _sub(r"(\n?\ *)(?<!\\)(\\fi)(?=\s|\n|$)", r"\n\2", text)
+    text = _sub(r"(\n?\ *)(?<!\\)(\\else)(?=\s|\n|$)", r"\n\2", text)
 
     # end all ``\end{...}`` on newline
-    text = re.sub(r"(?<!\\)(\\end\{[^\}]*\})(\ *\n?)", r"\1\n", text)
+    text = _sub(r"(?<!\\)(\\end\{[^\}]*\})(\ *\n?)", r"\1\n", text)
 
     # end all ``\[`` and ``\]`` on newline
-    text = re.sub(r"(?<!\\)(\\(\[|\]))(\ *\n?)", r"\1\n", text)
+    text = _sub(r"(?<!\\)(\\(\[|\]))(\ *\n?)", r"\1\n", text)
 
     # end all ``\if`` and ``\else`` and ``\fi`` on newline
-    text = re.sub(r"(?<!\\)(\\if)([\@\w]*)(\ +\n?)", r"\1\2\n", text)
-    text = re.sub(r"(?<!\\)(\\(fi|else))(\ +\n?)", r"\1\n", text)
+    text = _sub(r"(?<!\\)(\\if)([\@\w]*)(\ +\n?)", r"\1\2\n", text)
+    text = _sub(r"(?<!\\)(\\(fi|else))(\ +\n?)", r"\1\n", text)
 
     # end all ``\begin{...}[...]{...}`` on newline
-    for env in environments(text):
-        if env in ["equation", "equation*", "align", "align*", "alignat", "alignat*", "split"]:
-            # math environments cannot have arguments
-            commands = [[i.span()] for i in re.finditer(rf"(?<!\\)(\\)(begin{{{env}}})", text)]
-        else:
-            is_comment = _is_placeholder(text, comment_placeholders)
-            commands = find_command(
-                text, regex=rf"(?<!\\)(\\)(begin{{{env}}})", is_comment=is_comment
-            )
+    # (math environments cannot have options or arguments)
+    math = ["equation", "equation*", "align", "align*", "alignat", "alignat*", "split"]
+    is_comment = _is_placeholder(text, comment_placeholders)
+    commands = []
+    last = 0
+    for command in find_commands(text, ["begin"], is_comment=is_comment)["begin"]:
+        if len(command) < 2 or command[1][0] != command[0][1] or text[command[1][0]] != "{":
+            continue
+        if command[0][0] < last:
+            continue
+        if text[command[1][0] + 1 : command[1][1] - 1] in math:
+            command = command[:2]
+        commands.append(command)
+        last = command[-1][1]
 
-        commands = commands + [[[None, None]]]
-        split = [text[0 : commands[0][0][0]]]
+    if len(commands) == 0:
+        return text
 
-        for i in range(len(commands) - 1):
-            split += [
-                text[commands[i][0][0] : commands[i][-1][1]],
-                re.sub(r"^(\ *\n?)(.*)", r"\n\2", text[commands[i][-1][1] : commands[i + 1][0][0]]),
-            ]
+    commands = commands + [[[None, None]]]
+    split = [text[0 : commands[0][0][0]]]
 
-        text = "".join(split)
+    for i in range(len(commands) - 1):
+        split += [
+            text[commands[i][0][0] : commands[i][-1][1]],
+            re.sub(r"^(\ *\n?)(.*)", r"\n\2", text[commands[i][-1][1] : commands[i + 1][0][0]]),
+        ]
 
-    return text
+    return "".join(split)
 
 
 def _placeholders_lrsquash(placeholders: list[Placeholder]) -> list[Placeholder]:
@@ -1400,6 +2288,310 @@ def _detail_indent_comments(text, lstrip) -> tuple[str, list[Placeholder]]:
     return text, placeholders_comment + placeholders_rcomment
 
 
+class IndentProfile:
+    """
+    Wall time and size of the input (number of characters) per stage of :py:func:`indent`.
+    Use as context manager to record all calls of :py:func:`indent` (in the current thread)::
+
+        with texplain.IndentProfile() as profile:
+            texplain.indent(text)
+
+        print(profile.report())
+
+    Nested calls (e.g. for ``% \\begin{texindent}`` blocks) are part of the calling stage.
+    """
+
+    _local = threading.local()
+
+    def __init__(self):
+        #: Number of calls per stage.
+        self.calls = {}
+        #: Total wall time per stage (in seconds).
+        self.time = {}
+        #: Total size of the input per stage (number of characters).
+        self.size = {}
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = getattr(self._local, "profile", None)
+        self._local.profile = self
+        return self
+
+    def __exit__(self, *args):
+        self._local.profile = self._previous
+        self._previous = None
+
+    def __iadd__(self, other):
+        for stage in other.calls:
+            self.add(stage, other.time[stage], other.size[stage], other.calls[stage])
+        return self
+
+    def add(self, stage: str, time: float, size: int, calls: int = 1):
+        """
+        Record a stage.
+
+        :param stage: Name of the stage.
+        :param time: Wall time (in seconds).
+        :param size: Size of the input (number of characters).
+        :param calls: Number of calls.
+        """
+        with self._lock:
+            self.calls[stage] = self.calls.get(stage, 0) + calls
+            self.time[stage] = self.time.get(stage, 0.0) + time
+            self.size[stage] = self.size.get(stage, 0) + size
+
+    def report(self, title: str = "stage") -> str:
+        """
+        Table with the wall time (absolute and relative) and input size per stage.
+
+        :param title: Title of the table.
+        :return: Table, one stage per line.
+        """
+        total = sum(self.time.values())
+        width = max([len(title), 5] + [len(stage) for stage in self.calls])
+        ret = [f"{title:<{width}s} {'calls':>6s} {'time [s]':>10s} {'time [%]':>8s} {'size':>10s}"]
+        for stage in self.calls:
+            frac = 100 * self.time[stage] / total if total > 0 else 0
+            ret += [
+                f"{stage:<{width}s} {self.calls[stage]:6d} {self.time[stage]:10.4f} "
+                f"{frac:8.1f} {self.size[stage]:10d}"
+            ]
+        ret += [f"{'total':<{width}s} {'':6s} {total:10.4f} {100 if total > 0 else 0:8.1f}"]
+        return "\n".join(ret)
+
+    @classmethod
+    def _active(cls):
+        """
+        Profile to record to, ``None`` if not profiling (or in a nested call).
+        """
+        if getattr(cls._local, "depth", 0) != 1:
+            return None
+        return getattr(cls._local, "profile", None)
+
+
+def _profile_stages(func: callable) -> callable:
+    """
+    Decorator that allows recording stages of a function (see :py:func:`_stage`)
+    if a :py:class:`IndentProfile` is active.
+    """
+
+    @functools.wraps(func)
+    def wrapper(text, *args, **kwargs):
+        local = IndentProfile._local
+        local.depth = getattr(local, "depth", 0) + 1
+        if local.depth == 1:
+            local.stage = (time.perf_counter(), len(text))
+        try:
+            return func(text, *args, **kwargs)
+        finally:
+            local.depth -= 1
+
+    return wrapper
+
+
+def _stage(name: str, text: str):
+    """
+    Record the end of a stage of :py:func:`indent` (that started at the end of the previous stage).
+
+    :param name: Name of the stage.
+    :param text: Output of the stage (input of the next stage).
+    """
+    profile = IndentProfile._active()
+    if profile is None:
+        return
+    local = IndentProfile._local
+    now = time.perf_counter()
+    start, size = local.stage
+    profile.add(name, now - start, size)
+    local.stage = (now, len(text))
+
+
+class PerformanceCounters:
+    """
+    Counters that explain why formatting is slow (complementary to :py:class:`IndentProfile`).
+    Use as context manager to count in all calls (in the current thread)::
+
+        with texplain.PerformanceCounters() as counters:
+            texplain.indent(text)
+
+        print(counters.report())
+        json.dumps(counters.as_dict())
+
+    Counts of a nested context manager are added to the enclosing one on exit.
+    """
+
+    _local = threading.local()
+
+    def __init__(self):
+        #: Number of regex scans over a full text (a document, or a block of it that is formatted
+        #: separately). Anchored matches at a given position are not counted.
+        self.scans = 0
+        #: Total size of the scanned texts (number of characters).
+        self.scanned = 0
+        #: Number of placeholders created per :py:class:`PlaceholderType`.
+        self.placeholders = {}
+        #: Number of characters copied to replace text by placeholders and vice versa.
+        self.copied = 0
+        #: Maximal nesting depth reached in formatting commands (``0`` if not formatted).
+        self.depth = 0
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = getattr(self._local, "counters", None)
+        self._local.counters = self
+        return self
+
+    def __exit__(self, *args):
+        self._local.counters = self._previous
+        if self._previous is not None:
+            self._previous += self
+        self._previous = None
+
+    def __iadd__(self, other):
+        self.scans += other.scans
+        self.scanned += other.scanned
+        self.copied += other.copied
+        self.depth = max(self.depth, other.depth)
+        for ptype, n in other.placeholders.items():
+            self.add_placeholders(ptype, n)
+        return self
+
+    def add_placeholders(self, ptype: PlaceholderType, n: int):
+        """
+        Record created placeholders.
+
+        :param ptype: The type of placeholder (``None`` if not specified).
+        :param n: Number of placeholders.
+        """
+        self.placeholders[ptype] = self.placeholders.get(ptype, 0) + n
+
+    def as_dict(self) -> dict:
+        """
+        Counters as dictionary (that can be serialised to JSON).
+
+        :return: ``{"scans": ..., "scanned": ..., "copied": ..., "depth": ..., "placeholders": {}}``
+            with the placeholders per name of the :py:class:`PlaceholderType`.
+        """
+        return {
+            "scans": self.scans,
+            "scanned": self.scanned,
+            "copied": self.copied,
+            "depth": self.depth,
+            "placeholders": {
+                "none" if ptype is None else ptype.name: n for ptype, n in self.placeholders.items()
+            },
+        }
+
+    def report(self, title: str = "counter") -> str:
+        """
+        Table with the counters.
+
+        :param title: Title of the table.
+        :return: Table, one counter per line.
+        """
+        data = self.as_dict()
+        rows = {
+            "regex scans": data["scans"],
+            "characters scanned": data["scanned"],
+            "characters copied": data["copied"],
+            "command depth": data["depth"],
+        }
+        for name, n in sorted(data["placeholders"].items()):
+            rows[f"placeholders {name}"] = n
+        width = max([len(title)] + [len(name) for name in rows])
+        ret = [f"{title:<{width}s} {'count':>12s}"]
+        ret += [f"{name:<{width}s} {n:12d}" for name, n in rows.items()]
+        return "\n".join(ret)
+
+    @classmethod
+    def _active(cls):
+        """
+        Counters to record to, ``None`` if not counting.
+        """
+        return getattr(cls._local, "counters", None)
+
+
+def _count_scan(text: str):
+    """
+    Record a regex scan of a full text if :py:class:`PerformanceCounters` are active.
+    Do not call directly: scan with :py:func:`_finditer`, :py:func:`_search`, :py:func:`_sub`,
+    or :py:func:`_split`.
+
+    :param text: The scanned text.
+    """
+    counters = PerformanceCounters._active()
+    if counters is not None:
+        counters.scans += 1
+        counters.scanned += len(text)
+
+
+def _finditer(pattern: str | re.Pattern, text: str) -> Iterator[re.Match]:
+    """
+    :py:func:`re.finditer` over a full text (recorded by :py:class:`PerformanceCounters`).
+
+    :param pattern: Regex (or compiled regex).
+    :param text: Text.
+    :return: Iterator over the matches.
+    """
+    _count_scan(text)
+    return re.finditer(pattern, text)
+
+
+def _search(pattern: str | re.Pattern, text: str, flags: int = 0) -> re.Match:
+    """
+    :py:func:`re.search` in a full text (recorded by :py:class:`PerformanceCounters`).
+
+    :param pattern: Regex (or compiled regex).
+    :param text: Text.
+    :param flags: Regex flags.
+    :return: First match (``None`` if there is no match).
+    """
+    _count_scan(text)
+    return re.search(pattern, text, flags)
+
+
+def _sub(
+    pattern: str | re.Pattern, repl: str | callable, text: str, count: int = 0, flags: int = 0
+) -> str:
+    """
+    :py:func:`re.sub` over a full text (recorded by :py:class:`PerformanceCounters`).
+
+    :param pattern: Regex (or compiled regex).
+    :param repl: Replacement.
+    :param text: Text.
+    :param count: Maximum number of replacements (``0``: no limit).
+    :param flags: Regex flags.
+    :return: Text with replacements.
+    """
+    _count_scan(text)
+    return re.sub(pattern, repl, text, count, flags)
+
+
+def _split(pattern: str | re.Pattern, text: str) -> list[str]:
+    """
+    :py:func:`re.split` of a full text (recorded by :py:class:`PerformanceCounters`).
+
+    :param pattern: Regex (or compiled regex).
+    :param text: Text.
+    :return: Parts of the text.
+    """
+    _count_scan(text)
+    return re.split(pattern, text)
+
+
+def _count_copy(text: str):
+    """
+    Record a copy of a text if :py:class:`PerformanceCounters` are active.
+
+    :param text: The copied text.
+    """
+    counters = PerformanceCounters._active()
+    if counters is not None:
+        counters.copied += len(text)
+
+
+@_profile_stages
 def indent(
     text: str,
     indentation: str = "    ",
@@ -1531,13 +2723,12 @@ def indent(
     if len(text) == 0:
         return text
 
-    # check for known limitation
-    if re.match(r"(?<!\\)(\$)(?<!\\)(\$)", text):
-        raise NotImplementedError("Panic: don't know to deal with double dollar signs")
+    _check_double_dollar(text)
 
     # remove leading/trailing newlines, and trailing whitespace on each line
     if rstrip:
         text = _rstrip_lines(text.strip())
+    _stage("rstrip", text)
 
     # keep track of placeholders in effect
     placeholders = {}
@@ -1545,17 +2736,20 @@ def indent(
     # apply custom formatting to blocks ``% \begin{texindent}`` and ``% \end{texindent}``
     # "noindent" blocks are kept exactly as they are
     text, placeholders["noindent"] = _detail_indent_custom(text, texindent, noindent)
+    _stage("texindent/noindent", text)
 
     # comments: strip whitespaces but do no further formatting
     text, placeholders["comments"] = _detail_indent_comments(text, lstrip)
+    _stage("comments", text)
 
     # remove multiple newlines, duplicate spaces, and any leading whitespace
     if lstrip:
         text = _lstrip_lines(text)
     if squashlines:
-        text = re.sub(r"(\n\n+)", r"\n\n", text)
+        text = _sub(r"(\n\n+)", r"\n\n", text)
     if squashspaces:
-        text = re.sub(r"(\ +)", r" ", text)
+        text = _sub(r"(\ +)", r" ", text)
+    _stage("whitespace", text)
 
     # fold inline math
     text, placeholders["inline_math"] = text_to_placeholders(text, [PlaceholderType.inline_math])
@@ -1566,6 +2760,7 @@ def indent(
             placeholder.content = re.sub(r"(\ +)", r" ", placeholder.content)
             placeholder.space_front = None
             placeholder.space_back = None
+    _stage("inline math", text)
 
     # put ``\begin{...}``/ ``\end{...}`` and ``\[`` / ``\]`` on a newline
     if environment:
@@ -1574,15 +2769,17 @@ def indent(
         )
         text = _begin_end_one_separate_line(text, placeholders["comments"])
         text = text_from_placeholders(text, placeholders.pop("let"))
+    _stage("environment", text)
 
     # \\ ends on line
     if linebreak:
-        text = re.sub(r"(?<!\\)(\\\\)(\ *\n?)", r"\1\n", text)
+        text = _sub(r"(?<!\\)(\\\\)(\ *\n?)", r"\1\n", text)
 
     # \item starts on a new line
     # (any white line before \item is preserved)
     if itemize:
-        text = re.sub(r"(\n?\ *)(?<!\\)(\\item)", r"\n\2", text)
+        text = _sub(r"(\n?\ *)(?<!\\)(\\item)", r"\n\2", text)
+    _stage("linebreak/itemize", text)
 
     # format tables: align if possible
     if alignment:
@@ -1590,6 +2787,7 @@ def indent(
         for placeholder in placeholders["table"]:
             placeholder.content = _align(placeholder.content, placeholders)
         text = text_from_placeholders(text, placeholders.pop("table"))
+    _stage("alignment", text)
 
     # apply one sentence per line
     if sentence or argument:
@@ -1610,6 +2808,7 @@ def indent(
         text = text_from_placeholders(
             text, placeholders.pop("ignore") + placeholders.pop("commands")
         )
+    _stage("sentence/argument", text)
 
     # place placeholders where they belong to do indentation
     # thereafter they should not be repositioned
@@ -1619,29 +2818,31 @@ def indent(
     for placeholder in placeholders["comments"] + placeholders["inline_math"]:
         placeholder.space_front = None
         placeholder.space_back = None
+    _stage("restore comments", text)
 
     if indentation:
         assert lstrip
         assert environment
         assert inlinemath
 
-        # get line number of each character
-        lineno = np.empty(len(text), dtype=int)
-        i = 0
-        line = 0
-        for line, match in enumerate(re.finditer(r"\n", text)):
-            lineno[i : match.span()[0]] = line
-            i = match.span()[0]
-            lineno[i] = line
-            i += 1
-        lineno[i:] = line + 1
-        lineno = np.append(lineno, line + 2)
+        # scan text once, reuse for all searches below
+        index = DocumentIndex(text)
+
+        # line number of characters (one extra line number for the end of the text)
+        newlines = index.tokens.find(TokenType.newline)
 
-        # initialize indentation level
-        indent_level = np.zeros(lineno[-1] + 1, dtype=int)
+        def lineno(i):
+            i = np.asarray(i, dtype=int)
+            # ``-1`` (the character before the first) refers to the end of the text
+            i = np.where(i < 0, i + len(text) + 1, i)
+            return np.searchsorted(newlines, i) + (i == len(text))
+
+        # increase the indentation level of lines ``[start, end)`` for each ``(start, end)``
+        start = []
+        end = []
 
         # add indentation to all lines between ``\begin{...}`` and ``\end{...}``
-        for env in environments(text) + [PlaceholderType.math]:
+        for env in environments(text, index) + [PlaceholderType.math]:
             if env == PlaceholderType.math:
                 opening = r"\\\["
                 closing = r"\\\]"
@@ -1658,26 +2859,28 @@ def indent(
                 opening_match=1,
                 closing_match=0,
                 ignore_escaped=True,
+                return_array=True,
+                index=index,
             )
-            for opening, closing in indices.items():
-                indent_level[np.unique(lineno[opening:closing])[1:]] += 1
+            start += [lineno(indices[:, 0]) + 1]
+            end += [lineno(indices[:, 1] - 1) + 1]
 
         # add indentation to all lines between ``{`` and ``}`` containing at least one ``\n``
-        indices = find_matching(text, "{", "}", ignore_escaped=True, return_array=True)
-        for i in np.argwhere(lineno[indices[:, 0]] != lineno[indices[:, 1]]).ravel():
-            indent_level[lineno[indices[i, 0]] + 1 : lineno[indices[i, 1]]] += 1
+        indices = find_matching(text, "{", "}", ignore_escaped=True, return_array=True, index=index)
+        start += [lineno(indices[:, 0]) + 1]
+        end += [lineno(indices[:, 1])]
 
         # add indentation to all command options ``[`` and ``]`` containing at least one ``\n``
-        commands = find_command(text, is_comment=_is_placeholder(text, placeholders["comments"]))
-        indices = []
-        for command in commands:
-            if len(command) < 2:
-                continue
-            if text[command[1][0]] == "[":
-                indices += [command[1]]
-        indices = np.array(indices, dtype=int).reshape(-1, 2)
-        for i in np.argwhere(lineno[indices[:, 0]] != lineno[indices[:, 1]]).ravel():
-            indent_level[lineno[indices[i, 0]] + 1 : lineno[indices[i, 1]]] += 1
+        commands = find_command(
+            text,
+            is_comment=_is_placeholder(text, placeholders["comments"]),
+            index=index,
+            max_options=1,
+            max_arguments=0,
+        )
+        indices = np.array([i[1] for i in commands if len(i) > 1], dtype=int).reshape(-1, 2)
+        start += [lineno(indices[:, 0]) + 1]
+        end += [lineno(indices[:, 1])]
 
         # add indentation for ``\if``, ``\else``, ``\fi``
         indices = find_matching(
@@ -1688,20 +2891,491 @@ def indent(
             opening_match=1,
             closing_match=0,
             ignore_escaped=True,
+            return_array=True,
+            index=index,
         )
-        for opening, closing in indices.items():
-            indent_level[np.unique(lineno[opening - 1 : closing])[1:]] += 1
-        for match in re.finditer(r"(^|\n)(?<!\\)(\\else)(\n|$)", text):
-            indent_level[lineno[match.span(2)[0]]] -= 1
+        start += [lineno(indices[:, 0] - 1) + 1]
+        end += [lineno(indices[:, 1] - 1) + 1]
+        indices = [i.span(2)[0] for i in _finditer(r"(^|\n)(?<!\\)(\\else)(\n|$)", text)]
+        lines = lineno(indices)
+
+        # indentation level: cumulative sum of a difference array (+1 at start, -1 at end)
+        start = np.concatenate(start)
+        end = np.concatenate(end)
+        keep = start < end
+        indent_level = np.zeros(newlines.size + 3, dtype=int)
+        np.add.at(indent_level, start[keep], 1)
+        np.add.at(indent_level, end[keep], -1)
+        np.add.at(indent_level, lines, -1)
+        np.add.at(indent_level, lines + 1, 1)
+        indent_level = np.cumsum(indent_level).tolist()
 
         # apply indentation
         text = text.splitlines()
         for i in range(len(text)):
             text[i] = indent_level[i] * indentation + text[i]
         text = "\n".join(text)
+    _stage("indentation", text)
 
     text = text_from_placeholders(text, sum(placeholders.values(), []))
-    return _rstrip_lines(text)
+    text = _rstrip_lines(text)
+    _stage("restore", text)
+    return text
+
+
+def _check_double_dollar(text: str):
+    """
+    Check for a known limitation of :py:func:`indent`: the text cannot start with ``$$``.
+
+    :param text: Text (as passed to :py:func:`indent`).
+    """
+    if re.match(r"(?<!\\)(\$)(?<!\\)(\$)", text):
+        raise NotImplementedError("Panic: don't know to deal with double dollar signs")
+
+
+def _toplevel(
+    text: str,
+    positions: ArrayLike,
+    index: DocumentIndex = None,
+    custom: list[str] = ["noindent", "texindent"],
+) -> NDArray[np.bool_]:
+    r"""
+    Check if positions are at the top level of a text:
+    outside any environment, group (``{...}``, ``[...]``), math mode, ``\if...\fi`` block,
+    and ``% \begin{noindent}``/``% \begin{texindent}`` block.
+    The check is conservative: if there is an unmatched closing bracket no position is at the
+    top level.
+
+    :param text: Text.
+    :param positions: Indices of characters to check.
+    :param index: Index of ``text`` to reuse (default: computed).
+    :param custom:
+        Blocks that :py:func:`indent` formats separately (``"noindent"``, ``"texindent"``):
+        as in :py:func:`indent` text that follows ``% \end{noindent}`` on the same line
+        is not a comment.
+    :return: Per position if it is at the top level.
+    """
+
+    if index is None:
+        index = DocumentIndex(text)
+
+    positions = np.asarray(positions, dtype=int).ravel()
+    tokens = index.tokens
+    keep = ~tokens.commented
+
+    # the "comment" that closes a block ends the block, see :py:func:`indent`
+    for name in custom:
+        for i in _finditer(r"%\s*\\end{" + name + r"}((\\%|[^%\n])*)", text):
+            keep[
+                np.searchsorted(tokens.start, i.start(1)) : np.searchsorted(tokens.start, i.end(1))
+            ] = True
+
+    ttype = tokens.ttype[keep]
+    start = tokens.start[keep]
+
+    # number of opening minus the number of closing brackets (up to and including each token)
+    def depth(opening, closing):
+        step = np.isin(ttype, opening).astype(int) - np.isin(ttype, closing).astype(int)
+        return np.cumsum(step)
+
+    # \if...\fi and comment blocks are not tokens: add them as events
+    events = []
+    for regex, step in [
+        (r"(?<!\\)(?<!\\newif)(?<!\\let)(?<!\\def)\\if[\@\w]*(?![\@\w])(?!\s*\{)", 1),
+        (r"(?<!\\)\\fi(?![\@\w])", -1),
+    ]:
+        found = np.array([i.start() for i in _finditer(regex, text)], dtype=int)
+        found = found[~index.comments.is_commented(found)]
+        events += [np.vstack((found, step * np.ones_like(found)))]
+    for regex, step in [
+        (r"%\s*\\begin{(noindent|texindent)}", 1),
+        (r"%\s*\\end{(noindent|texindent)}", -1),
+    ]:
+        found = np.array([i.start() for i in _finditer(regex, text)], dtype=int)
+        events += [np.vstack((found, step * np.ones_like(found)))]
+    events = np.hstack(events)
+    events = events[:, np.argsort(events[0], kind="stable")]
+
+    levels = [
+        depth(TokenType.begin, TokenType.end),
+        depth(TokenType.curly_open, TokenType.curly_close),
+        depth(TokenType.display_math_open, TokenType.display_math_close),
+        depth(TokenType.inline_math_open, TokenType.inline_math_close),
+        np.cumsum(ttype == TokenType.dollar) % 2,
+    ]
+
+    # ``[...]`` is only counted outside other brackets (e.g. ``$[0, 1)$`` is common)
+    outside = np.ones(len(ttype), dtype=bool)
+    for level in levels:
+        outside &= level == 0
+    square = (ttype == TokenType.square_open).astype(int) - (ttype == TokenType.square_close)
+    levels += [np.cumsum(square * outside)]
+
+    ret = np.ones(len(positions), dtype=bool)
+
+    for offsets, level in [(start, i) for i in levels] + [(events[0], np.cumsum(events[1]))]:
+        if len(level) == 0:
+            continue
+        if np.any(level < 0):
+            return np.zeros(len(positions), dtype=bool)
+        i = np.searchsorted(offsets, positions, side="left") - 1
+        ret &= np.where(i < 0, 0, level[i]) == 0
+
+    return ret
+
+
+_leading_whitespace = re.compile(r"[^\S\n]*")
+
+
+def _indent_blocks(text: str, options: dict = None) -> list[tuple[int, int]]:
+    """
+    Split text in blocks that are indented independently by :py:func:`indent`:
+    the text is split at blank lines that are at the top level (see :py:func:`_toplevel`).
+
+    :param text: Text (with trailing whitespace removed from all lines).
+    :param options: All options of :py:func:`indent` (default: defaults of :py:func:`indent`).
+    :return: List of ``(start, end)`` of each block.
+    """
+
+    custom = ["noindent", "texindent"]
+    if options is not None:
+        custom = [name for name in custom if options[name]]
+
+    blank = np.array([i.span() for i in _finditer(r"\n\n+", text)], dtype=int).reshape(-1, 2)
+    blank = blank[_toplevel(text, blank[:, 0], custom=custom)]
+
+    ret = []
+    start = 0
+    for end, following in blank.tolist():
+        # indent keeps a tab (etc.) before a comment, but not at the beginning of the text
+        if len(_leading_whitespace.match(text, following).group().strip(" ")) > 0:
+            continue
+        ret += [(start, end)]
+        start = following
+    ret += [(start, len(text))]
+    return ret
+
+
+class IndentMemo:
+    """
+    Store of formatted blocks used by :py:func:`indent_incremental`.
+    The number of blocks is bounded, the least recently used block is evicted first.
+
+    :param maxsize: Maximum number of blocks.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._store = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._store)
+
+    @staticmethod
+    def key(text: str, options: dict) -> str:
+        """
+        Key of a block formatted with certain options.
+
+        :param text: Block of text.
+        :param options: Options of :py:func:`indent`.
+        :return: Hash of text and options.
+        """
+        data = repr(sorted(options.items())) + "\n" + text
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def get(self, key: str) -> str:
+        """
+        Get formatted block.
+
+        :param key: See :py:func:`IndentMemo.key`.
+        :return: Formatted block, ``None`` if not stored.
+        """
+        with self._lock:
+            ret = self._store.get(key)
+            if ret is not None:
+                self._store.move_to_end(key)
+            return ret
+
+    def set(self, key: str, formatted: str):
+        """
+        Store formatted block.
+
+        :param key: See :py:func:`IndentMemo.key`.
+        :param formatted: Formatted block.
+        """
+        with self._lock:
+            self._store[key] = formatted
+            self._store.move_to_end(key)
+            while len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all blocks.
+        """
+        with self._lock:
+            self._store.clear()
+
+
+def _indent_options(kwargs: dict) -> dict:
+    """
+    All options of :py:func:`indent`.
+
+    :param kwargs: Options, see :py:func:`indent`.
+    :return: Options (including defaults).
+    """
+    options = inspect.signature(indent).bind("", **kwargs)
+    options.apply_defaults()
+    options = dict(options.arguments)
+    options.pop("text")
+    return options
+
+
+def _indent_separators(text: str, blocks: list[tuple[int, int]], options: dict) -> list[str]:
+    """
+    Text that :py:func:`indent` puts between consecutive blocks, see :py:func:`_indent_blocks`.
+
+    :param text: Text.
+    :param blocks: List of ``(start, end)`` of each block.
+    :param options: All options of :py:func:`indent`, see :py:func:`_indent_options`.
+    :return: Separator between each two consecutive blocks.
+    """
+
+    # blank lines before blocks that are kept as they are are squashed,
+    # blank lines before comments are kept
+    squash = []
+    if options["noindent"]:
+        squash += [r"%\s*\\begin{noindent}", r"\\begin{verbatim}"]
+    if options["texindent"]:
+        squash += [r"%\s*\\begin{texindent}"]
+    squash = re.compile("|".join(squash)) if len(squash) > 0 else None
+
+    ret = []
+
+    for (_, end), (start, _) in zip(blocks[:-1], blocks[1:]):
+        # leading whitespace is removed by indent
+        first = _leading_whitespace.match(text, start).end()
+        if squash is not None and squash.match(text, first):
+            ret += ["\n\n"]
+        elif options["squashlines"] and not text.startswith("%", first):
+            ret += ["\n\n"]
+        else:
+            ret += [text[end:start]]
+
+    return ret
+
+
+def _indent_block(text: str, **kwargs) -> str:
+    """
+    Indent a block of text, see :py:func:`_indent_blocks`.
+    Different from :py:func:`indent` the block may start with ``$$``
+    (the known limitation only applies to the beginning of the input, see :py:func:`_indent_split`).
+
+    :param text: Block of text.
+    :param kwargs: Options, see :py:func:`indent`.
+    :return: The indented block.
+    """
+    if text.startswith("$$"):
+        text = "\n" + text
+    return indent(text, **kwargs)
+
+
+def _indent_split(text: str, kwargs: dict) -> tuple[str, list[tuple[int, int]], list[str], dict]:
+    """
+    Split text in blocks that are formatted independently by :py:func:`indent`,
+    see :py:func:`_indent_blocks`.
+
+    :param text: The text to indent.
+    :param kwargs: Options, see :py:func:`indent`.
+    :return:
+        ``(text, blocks, separators, options)`` where ``text`` is the text with trailing
+        whitespace removed, ``blocks`` a list of ``(start, end)`` of each block in ``text``,
+        ``separators`` the text that :py:func:`indent` puts between two consecutive blocks,
+        and ``options`` all options of :py:func:`indent` (including defaults).
+    """
+
+    options = _indent_options(kwargs)
+    _check_double_dollar(text)
+
+    if not options["rstrip"] or not options["lstrip"]:
+        return text, [(0, len(text))], [], options
+
+    text = _rstrip_lines(text.strip())
+    blocks = _indent_blocks(text, options)
+    return text, blocks, _indent_separators(text, blocks, options), options
+
+
+def _indent_join(formatted: list[str], separators: list[str]) -> str:
+    """
+    Join blocks formatted by :py:func:`indent`, see :py:func:`_indent_split`.
+
+    :param formatted: Formatted blocks.
+    :param separators: Separators between the blocks.
+    :return: Formatted text.
+    """
+    ret = [formatted[0]]
+    for separator, block in zip(separators, formatted[1:]):
+        ret += [separator, block.lstrip("\n")]
+    return "".join(ret)
+
+
+_indent_memo = IndentMemo()
+
+
+def indent_incremental(text: str, memo: IndentMemo = None, **kwargs) -> str:
+    """
+    Indent text, reformat only blocks that changed since a previous call.
+    The text is split at blank lines outside environments, braces, math, ...
+    Each block is formatted by :py:func:`indent` and stored in ``memo``,
+    such that a block is only formatted again if its content (or the options) changed.
+    The result is identical to :py:func:`indent`.
+
+    :param text: The text to indent.
+    :param memo: Store of formatted blocks (default: a store shared by all calls).
+    :param kwargs: Options, see :py:func:`indent`.
+    :return: The indented text.
+    """
+
+    if memo is None:
+        memo = _indent_memo
+
+    text, blocks, separators, options = _indent_split(text, kwargs)
+    formatted = []
+
+    for start, end in blocks:
+        block = text[start:end]
+        key = memo.key(block, options)
+        ret = memo.get(key)
+        if ret is None:
+            ret = _indent_block(block, **kwargs)
+            memo.set(key, ret)
+        formatted += [ret]
+
+    return _indent_join(formatted, separators)
+
+
+def indent_stream(lines: Iterable[str], **kwargs) -> Iterator[str]:
+    """
+    Indent text that is read line-by-line, yield the formatted text line-by-line.
+    The text is split at blank lines outside environments, braces, math, ... (as
+    :py:func:`indent_incremental`), only the block that is being read is kept in memory.
+    The result is identical to :py:func:`indent`.
+
+    .. note::
+
+        If ``rstrip`` or ``lstrip`` is switched off, all text is read before formatting.
+
+    .. note::
+
+        Blocks are yielded as soon as they are complete. Different from :py:func:`indent`
+        an error that is only detected later in the text (e.g. an unmatched closing bracket)
+        does not prevent the blocks before it from being formatted.
+
+    :param lines:
+        The text to indent, one line per item (with or without line-break),
+        e.g. an open file or ``text.splitlines()``.
+    :param kwargs: Options, see :py:func:`indent`.
+    :return: Iterator over the formatted lines (including the line-breaks).
+    """
+
+    options = _indent_options(kwargs)
+
+    if not options["rstrip"] or not options["lstrip"]:
+        lines = list(lines)
+        text = "".join(line if line.endswith("\n") else line + "\n" for line in lines[:-1])
+        text += lines[-1] if len(lines) > 0 else ""
+        yield from indent(text, **kwargs).splitlines(keepends=True)
+        return
+
+    buffer = []  # lines read (trailing whitespace removed)
+    size = 0  # number of characters in "buffer"
+    check = 0  # minimal "size" to look for blocks (avoid checking the same block repeatedly)
+    first = True  # "buffer" starts with the first block
+    pending = ""  # formatted text that does not end with a line-break
+
+    def emit(text, blocks, separators):
+        nonlocal first, pending
+        ret = [_indent_block(text[start:end], **kwargs) for start, end in blocks]
+        ret = _indent_join(ret, separators)
+        ret = pending + (ret if first else ret.lstrip("\n"))
+        first = False
+        ret = ret.splitlines(keepends=True)
+        if len(ret) > 0 and not ret[-1].endswith("\n"):
+            pending = ret.pop()
+        else:
+            pending = ""
+        return ret
+
+    for i, line in enumerate(lines):
+        if i == 0:
+            _check_double_dollar(line)
+        line = line.rstrip()
+        if first and len(buffer) == 0:
+            line = line.lstrip()
+            if len(line) == 0:
+                continue
+        # all complete blocks are formatted, except the last one:
+        # its separator (and whether it is complete) depends on the next block
+        if len(line) == 0 and len(buffer[-1]) > 0 and size >= check:
+            text = "\n".join(buffer)
+            blocks = _indent_blocks(text, options)
+            if len(blocks) > 1:
+                separators = _indent_separators(text, blocks, options)
+                yield from emit(text, blocks[:-1], separators[:-1])
+                pending += separators[-1]
+                buffer = text[blocks[-1][0] :].split("\n")
+                size = len(text) - blocks[-1][0]
+            check = 2 * size
+        buffer.append(line)
+        size += len(line) + 1
+
+    if len(buffer) == 0 and first:
+        yield from indent("", **kwargs).splitlines(keepends=True)
+        return
+
+    text = "\n".join(buffer).rstrip()
+    blocks = _indent_blocks(text, options)
+    yield from emit(text, blocks, _indent_separators(text, blocks, options))
+
+    if len(pending) > 0:
+        yield pending
+
+
+_sectioning = re.compile(r"\\(part|chapter|section)(?![\@a-zA-Z])")
+
+
+def indent_parallel(text: str, jobs: int = 0, **kwargs) -> str:
+    r"""
+    Indent text, format parts in parallel.
+    The text is split before ``\part``, ``\chapter``, and ``\section`` that
+    are preceded by a blank line and are outside environments, braces, math, ...
+    The parts are formatted by :py:func:`indent` in a process pool.
+    The result is identical to :py:func:`indent`.
+
+    :param text: The text to indent.
+    :param jobs: Number of processes (``0``: number of cores).
+    :param kwargs: Options, see :py:func:`indent`.
+    :return: The indented text.
+    """
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    text, blocks, separators, _ = _indent_split(text, kwargs)
+    cut = [0] + [i for i in range(1, len(blocks)) if _sectioning.match(text, blocks[i][0])]
+    cut += [len(blocks)]
+
+    if jobs == 1 or len(cut) <= 2:
+        return _indent_block(text, **kwargs)
+
+    parts = [text[blocks[i][0] : blocks[j - 1][1]] for i, j in zip(cut[:-1], cut[1:])]
+    separators = [separators[i - 1] for i in cut[1:-1]]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        formatted = list(pool.map(functools.partial(_indent_block, **kwargs), parts))
+
+    return _indent_join(formatted, separators)
 
 
 def _argument_block_one_per_line(text: str) -> str:
@@ -1792,29 +3466,28 @@ def _one_sentence_per_line(
     skip = []
 
     # \begin{...}
-    skip += [i.span() for i in re.finditer(r"(?<!\\)(\\)(begin\{\w*\}\s*)", text)]
+    skip += [i.span() for i in _finditer(r"(?<!\\)(\\)(begin\{\w*\}\s*)", text)]
 
     # \end{...}
-    skip += [i.span() for i in re.finditer(r"(?<!\\)(\\)(end\{\w*\}\s*)", text)]
+    skip += [i.span() for i in _finditer(r"(?<!\\)(\\)(end\{\w*\}\s*)", text)]
 
     # \\
-    skip += [i.span() for i in re.finditer(r"(\\\\)", text)]
+    skip += [i.span() for i in _finditer(r"(\\\\)", text)]
 
     # multiple newlines
-    skip += [i.span() for i in re.finditer(r"(\n\n+)", text)]
+    skip += [i.span() for i in _finditer(r"(\n\n+)", text)]
 
     if len(skip) == 0:
         ret = _detail_one_sentence_per_line(text)
     else:
-        skip = np.array(skip)
-        skip = _filter_nested(skip[skip[:, 0].argsort()])
         # merge consecutive blocks
-        keep = np.ones(skip.shape[0], dtype=bool)
-        for i in range(skip.shape[0] - 1):
-            if skip[i, 1] == skip[i + 1, 0]:
-                skip[i + 1, 0] = skip[i, 0]
-                keep[i] = False
-        skip = skip[keep]
+        merged = []
+        for s, e in _filter_nested(skip):
+            if len(merged) > 0 and merged[-1][1] == s:
+                merged[-1][1] = e
+            else:
+                merged.append([s, e])
+        skip = merged
 
         ret = ""
         start = 0
@@ -1859,6 +3532,10 @@ def _format_command(
     :param level: Level of nested-ness, used to define unique placeholder names.
     :return: Formatted text.
     """
+    counters = PerformanceCounters._active()
+    if counters is not None:
+        counters.depth = max(counters.depth, level + 1)
+
     if not re.match(r".*\n.*", text):
         return text
 
@@ -1878,7 +3555,7 @@ def _format_command(
             for j in i[1:]:
                 braces += [j]
 
-        braces = list(_filter_nested(np.array(braces))) + [[None, None]]
+        braces = _filter_nested(braces) + [[None, None]]
 
         parts = [text[: braces[0][0]]]
         for i in range(len(braces) - 1):
@@ -1911,25 +3588,66 @@ def _format_command(
     return "".join(parts)
 
 
-def _classify_for_label(text: str) -> tuple[list[str], NDArray[np.int_]]:
+class _Intervals:
+    """
+    Categorised intervals (that can be nested), to look up the innermost interval that contains
+    an offset by binary search.
+    Of intervals that start at the same offset, the one with the lowest category is innermost.
+
+    :param intervals: List of ``(start, end, category)`` with ``category`` an integer.
+    :param default: Category of offsets that are not in any interval.
+    """
+
+    def __init__(self, intervals: list[tuple[int, int, int]], default: int = 0):
+        intervals = sorted(intervals, key=lambda i: (i[0], -i[2]))
+        self.start = [i[0] for i in intervals]
+        self.end = [i[1] for i in intervals]
+        self.category = [i[2] for i in intervals]
+        self.default = default
+
+        # the closest preceding interval that ends after the start of an interval
+        # (intervals in between end before the start, and thus before any later offset)
+        self.parent = []
+        stack = []
+        for k, start in enumerate(self.start):
+            while len(stack) > 0 and self.end[stack[-1]] <= start:
+                stack.pop()
+            self.parent += [stack[-1] if len(stack) > 0 else -1]
+            stack += [k]
+
+    def __getitem__(self, offset: int) -> int:
+        k = bisect.bisect_right(self.start, offset) - 1
+        while k >= 0:
+            if self.end[k] > offset:
+                return self.category[k]
+            k = self.parent[k]
+        return self.default
+
+
+def _classify_for_label(text: str, index: DocumentIndex = None) -> tuple[list[str], _Intervals]:
     """
     Classify each character.
     This can be used for example to figure out to which environment a label belongs.
+    Memory use is proportional to the number of environments, footnotes, and sections
+    (not to the length of the text).
 
     :param text: The text to classify.
+    :param index: Index of ``text`` to reuse (default: computed).
     :return:
         ``(categories, classification)`` where ``categories`` is the list of categories
-        (``"eq"``, ``"fig"``, etc.; with ``"misc"`` for unknown) and ``classification`` is an array
-        of the same length as ``text`` where each element is the index in ``categories`` to which
-        the character belongs.
+        (``"eq"``, ``"fig"``, etc.; with ``"misc"`` for unknown) and ``classification[i]``
+        is the index in ``categories`` to which character ``i`` belongs.
     """
 
+    if index is None:
+        index = DocumentIndex(text)
+
     categories = ["misc", "eq", "item", "note", "sec", "ch", "fig", "tab"]
-    starting = -1 * np.ones((len(text), len(categories)), dtype=int)
-    braces = find_matching(text, "{", "}", ignore_escaped=True)
+    intervals = []
+    braces = find_matching(text, "{", "}", ignore_escaped=True, index=index)
 
     envs = defaultdict(list)
-    for env in _environments_impl(text=text, curly_braces=braces):
+    for env in environments(text, index):
         name = re.split(r"(\w*)(\*?)", env)[1]
         if name in ["equation", "align", "eqnarray"]:
             envs["eq"].append(env)
@@ -1952,17 +3670,16 @@ def _classify_for_label(text: str) -> tuple[list[str], NDArray[np.int_]]:
                 escape=False,
                 closing_match=1,
             )
-            for i, j in index.items():
-                starting[i:j, r] = i
+            intervals += [(i, j, r) for i, j in index.items()]
 
     # "note"
 
     r = categories.index("note")
 
-    for match in re.finditer(r"(\\footnote\s*\{)", text):
+    for match in _finditer(r"(\\footnote\s*\{)", text):
         i = match.span()[0]
         j = braces[match.span()[1] - 1]
-        starting[i:j, r] = i
+        intervals += [(i, j, r)]
 
     # "sec" / "ch"
 
@@ -1971,22 +3688,25 @@ def _classify_for_label(text: str) -> tuple[list[str], NDArray[np.int_]]:
         "ch": r"(\\)(chapter\s*\{)",
     }
 
+    label = re.compile(r"(\\)(label\{)")
+
     for category, pattern in patterns.items():
 
         r = categories.index(category)
 
-        for match in re.finditer(pattern, text):
+        for match in _finditer(pattern, text):
             i = match.span()[0]
             j = braces[match.span()[1] - 1]
-            for label in re.finditer(r"(\\)(label\{)", text[j + 1 :]):
-                s = label.span()[1] + j + 1
-                e = braces[s - 1]
-                between = remove_comments(text[j + 1 : s - 7])
-                if len(between.strip()) == 0:
-                    starting[i:e, r] = i
-                break
+            m = label.search(text, j + 1)
+            if m is None:
+                continue
+            s = m.span()[1]
+            e = braces[s - 1]
+            between = remove_comments(text[j + 1 : s - 7])
+            if len(between.strip()) == 0:
+                intervals += [(i, e, r)]
 
-    return categories, np.argmax(starting, axis=1)
+    return categories, _Intervals(intervals)
 
 
 class TeX:
@@ -2022,20 +3742,21 @@ class TeX:
         self.original = text
 
     @classmethod
-    def from_file(cls, filename: str):
+    def from_file(cls, filename: str, text: str = None):
         """
         Read from file.
 
         :param filename: Path to the file to read.
+        :param text: Content of the file (default: read from ``filename``).
         """
 
         file = pathlib.Path(filename)
-        ret = cls(file.read_text())
+        ret = cls(file.read_text() if text is None else text)
         ret.dirname = file.parent
         ret.filename = file.name
 
-        has_input = re.search(r"(.*)(\\input\{)(.*)(\})", ret.original, re.MULTILINE)
-        has_include = re.search(r"(.*)(\\include\{)(.*)(\})", ret.original, re.MULTILINE)
+        has_input = _search(r"(.*)(\\input\{)(.*)(\})", ret.original, re.MULTILINE)
+        has_include = _search(r"(.*)(\\include\{)(.*)(\})", ret.original, re.MULTILINE)
 
         if has_input or has_include:
             raise OSError(r"TeX files with \input{...} or \include{...} not supported")
@@ -2156,10 +3877,12 @@ class TeX:
         :return: Unique list of keys in the order or appearance.
         """
 
-        curly_braces = find_matching(self.main, "{", "}", ignore_escaped=True)
+        curly_braces = find_matching(
+            self.main, "{", "}", ignore_escaped=True, index=DocumentIndex.get(self.main)
+        )
         cite = []
 
-        for i in re.finditer(r"(\\cite)([pt])?(\[.*\]\[.*\])?(\{)", self.main):
+        for i in _finditer(r"(\\cite)([pt])?(\[.*\]\[.*\])?(\{)", self.main):
             o = i.span()[1]
             c = curly_braces[o - 1]
             cite += list(filter(None, self.main[o:c].replace("\n", " ").split(",")))
@@ -2218,40 +3941,41 @@ class TeX:
         command and then continues to replace the inner command.
         """
 
-        if not re.search(re.escape(cmd) + "{", self.main):
+        if not _search(re.escape(cmd) + "{", self.main):
             return
 
         n = len(cmd)
+        index = DocumentIndex.get(self.main)
         curly_braces = find_matching(
-            self.main, "{", "}", ignore_escaped=True, ignore_commented=ignore_commented
+            self.main,
+            "{",
+            "}",
+            ignore_escaped=True,
+            ignore_commented=ignore_commented,
+            index=index,
         )
         closing = sorted(curly_braces[i] for i in curly_braces)
-        opening = np.array(sorted(i for i in curly_braces))
-        next_opening = {}
-        for i in closing:
-            j = np.argmax(opening > i)
-            next_opening[i] = opening[j]
+        opening = np.array(sorted(i for i in curly_braces), dtype=int)
+        j = np.searchsorted(opening, closing, side="right")
+        j[j == opening.size] = 0
+        next_opening = dict(zip(closing, opening[j].tolist()))
 
         last = 0
-        ret = ""
+        ret = []
 
         if ignore_commented:
-            comments = np.array(find_commented(self.main))
-            if comments.size == 0:
+            comments = index.comments
+            if len(comments) == 0:
                 ignore_commented = False
 
-        if ignore_commented:
-            comments_start = comments[:, 0]
-            comments_end = comments[:, 1]
-
-        for match in re.finditer(re.escape(cmd) + "{", self.main):
+        for match in _finditer(re.escape(cmd) + "{", self.main):
             opening = match.span(0)[0] + n
 
             if opening < last:
                 continue
 
             if ignore_commented:
-                if np.any(np.logical_and(opening >= comments_start, opening < comments_end)):
+                if comments.is_commented(opening):
                     continue
 
             parts = []
@@ -2273,17 +3997,17 @@ class TeX:
                 out = out[:a] + parts[i - 1] + out[b:]
 
             j = match.span(0)[0]
-            ret = ret + self.main[last:j] + out
+            ret += [self.main[last:j], out]
             last = closing + 1
 
-        self.main = ret + self.main[last:]
+        self.main = "".join(ret) + self.main[last:]
 
         if ignore_commented:
             test = remove_comments(self.main)
         else:
             test = self.main
 
-        if re.search(re.escape(cmd) + "{", test):
+        if _search(re.escape(cmd) + "{", test):
             return self._replace_command_impl(cmd, nargs, replace, ignore_commented)
 
     def replace_command(self, cmd: str, replace: str, ignore_commented: bool = False):
@@ -2356,64 +4080,52 @@ class TeX:
     def change_label(self, old_label: str, new_label: str, overwrite: bool = False):
         r"""
         Change label in ``\label{...}`` and ``\ref{...}`` (-like) commands.
+        See :py:func:`TeX.change_labels` to change several labels.
 
         :param old_label: Old label.
         :param new_label: New label.
         :param overwrite: Overwrite existing labels.
         """
+        self.change_labels({old_label: new_label}, overwrite=overwrite)
 
-        if old_label == new_label:
-            return
-
-        if not overwrite:
-            if new_label in self.labels():
-                raise OSError(f'Label "{new_label:s}" already exists')
-
-        old = re.escape(old_label)
-        new = new_label
-
-        # single labels
-
-        self.main = re.sub(
-            r"(\\label{)(" + old + ")(})", r"\1" + new + r"\3", self.main, re.MULTILINE
-        )
-
-        self.main = re.sub(
-            r"(\\)(\w*)(ref\*?{)(" + old + ")(})", r"\1\2\3" + new + r"\5", self.main, re.MULTILINE
-        )
-
-        # grouped labels
+    def change_labels(self, mapping: dict[str, str], overwrite: bool = False):
+        r"""
+        Change labels in ``\label{...}`` and ``\ref{...}`` (-like) commands
+        (including grouped references ``\cref{...,...}``), in one scan of the text.
 
-        self.main = re.sub(
-            r"(\\cref\*?{)(" + old + ")(,[^}]*})", r"\1" + new + r"\3", self.main, re.MULTILINE
-        )
+        :param mapping:
+            ``{old_label: new_label, ...}``.
+            A label that is mapped to itself is kept (and is not a collision).
+        :param overwrite: Overwrite existing labels.
+        """
 
-        self.main = re.sub(
-            r"(\\cref\*?{[^}]*,)(" + old + ")(})", r"\1" + new + r"\3", self.main, re.MULTILINE
-        )
+        if not overwrite:
+            labels = set(self.labels())
+            taken = labels.difference(mapping)
+            renamed = set()
+            for old, new in mapping.items():
+                if new in taken or (old in labels and new in renamed):
+                    raise OSError(f'Label "{new:s}" already exists')
+                if old in labels:
+                    renamed.add(new)
+
+        mapping = {old: new for old, new in mapping.items() if old != new}
+
+        if len(mapping) == 0:
+            return
 
-        self.main = re.sub(
-            r"(\\cref\*?{[^}]*,)(" + old + ")(})", r"\1" + new + r"\3", self.main, re.MULTILINE
-        )
+        def replace(match):
+            labels = [mapping.get(label, label) for label in _split_labels(match)]
+            return match.group(1) + ",".join(labels) + "}"
 
-        self.main = re.sub(
-            r"(\\cref\*?{[^}]*,)(" + old + ")(,[^}]*})",
-            r"\1" + new + r"\3",
-            self.main,
-            re.MULTILINE,
-        )
+        self.main = _sub(_label_regex, replace, self.main)
 
     def labels(self) -> list[str]:
         """
         Return list of labels (in order of appearance).
+        See :py:class:`LabelIndex` for the positions of labels and references.
         """
-
-        labels = []
-
-        for i in re.findall(r"(.*)(\\label{)([^}]*)(})(.*)", self.main, re.MULTILINE):
-            labels.append(i[2])
-
-        return labels
+        return list(DocumentIndex.get(self.main).labels)
 
     def _reformat(self, label: str, key: str, prefix: str = None):
         """
@@ -2449,7 +4161,7 @@ class TeX:
         r"""
         Return list with present environments (between ``\begin{...} ... \end{...}``).
         """
-        return environments(self.main)
+        return environments(self.main, DocumentIndex.get(self.main))
 
     def format_labels(self, prefix: str = None):
         """
@@ -2466,17 +4178,16 @@ class TeX:
         :param prefix: Add optional ``prefix``. E.g. ``key:prefix:...``.
         """
 
-        categories, classification = _classify_for_label(self.main)
+        index = DocumentIndex.get(self.main)
+        categories, classification = _classify_for_label(self.main, index)
         change = {}
 
-        for label in self.labels():
-            i = self.main.index(rf"\label{{{label}}}")
-            c = self._reformat(label, categories[classification[i]], prefix=prefix)
+        for label, offsets in index.labels.definitions.items():
+            c = self._reformat(label, categories[classification[offsets[0]]], prefix=prefix)
             if c != label:
                 change[label] = c
 
-        for label in change:
-            self.change_label(label, change[label])
+        self.change_labels(change)
 
     def use_cleveref(self):
         """
@@ -2494,7 +4205,7 @@ class TeX:
         """
 
         for key in ["Figure", "Fig.", "Table", "Tab.", "Chapter", "Ch.", "Section", "Sec."]:
-            self.main = re.sub(
+            self.main = _sub(
                 r"(" + key + r"~?\s?\\ref)(\*?{)([^}]*})",
                 r"\\cref\2\3",
                 self.main,
@@ -2503,28 +4214,28 @@ class TeX:
             )
 
         for key in ["Equation", "Eq."]:
-            self.main = re.sub(
+            self.main = _sub(
                 r"(" + key + r"~?\s?\\ref)(\*?{)([^}]*})",
                 r"\\cref\2\3",
                 self.main,
                 re.MULTILINE,
                 re.IGNORECASE,
             )
-            self.main = re.sub(
+            self.main = _sub(
                 r"(" + key + r"~?\s?\\eqref)(\*?{)([^}]*})",
                 r"\\cref\2\3",
                 self.main,
                 re.MULTILINE,
                 re.IGNORECASE,
             )
-            self.main = re.sub(
+            self.main = _sub(
                 r"(" + key + r"~?\s?\(\\ref)(\*?{)([^}]*})(\))",
                 r"\\cref\2\3",
                 self.main,
                 re.MULTILINE,
                 re.IGNORECASE,
             )
-            self.main = re.sub(
+            self.main = _sub(
                 r"(" + key + r"~?\s?\[\\ref)(\*?{)([^}]*})(\])",
                 r"\\cref\2\3",
                 self.main,
@@ -2578,6 +4289,7 @@ def bib_select(text: str, keys: list[str], reorder: bool = False) -> str:
 
     _, forward = np.unique(keys, return_index=True)
     keys = [keys[i] for i in np.sort(forward)]
+    select = set(keys)
 
     text = "\n" + text
     bib = list(filter(None, text.split("@")))[1:]
@@ -2591,7 +4303,7 @@ def bib_select(text: str, keys: list[str], reorder: bool = False) -> str:
         if re.match(r"(comment\{)(.*)", i, re.IGNORECASE):
             continue
         key = re.split(r"(.*\{)(.*)(,\n.*)", i)[2]
-        if key in keys:
+        if key in select:
             out[key] = i
 
     if reorder:
@@ -2607,6 +4319,305 @@ def bib_select(text: str, keys: list[str], reorder: bool = False) -> str:
     return out
 
 
+def _default_cache_dir() -> pathlib.Path:
+    """
+    Default directory of :py:class:`FormatCache`: ``$XDG_CACHE_HOME/texplain``
+    (``~/.cache/texplain`` if ``XDG_CACHE_HOME`` is not set).
+    """
+    root = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return pathlib.Path(root) / "texplain"
+
+
+class FormatCache:
+    """
+    Persistent cache of formatted files, used by the command-line tools.
+    Files are identified by the hash of their content, combined with the options of the tool and
+    the version of texplain.
+    Stored is the formatted content, or just a marker if the file was already formatted.
+
+    Before reading a file, its modification time and size are compared to those of a file
+    with the same path that was previously found to be formatted.
+    If they match, the file is not read.
+
+    Entries are written atomically, such that several processes can share the cache.
+    Use :py:func:`FormatCache.prune` to remove the least recently used entries
+    if the cache exceeds ``maxsize``.
+
+    :param path: Directory of the cache.
+    :param options: Options of the tool (must have a deterministic ``repr``).
+    :param maxsize: Maximum size of the cache in bytes.
+    """
+
+    def __init__(self, path: str, options: dict, maxsize: int = 100 * 1024**2):
+        self.path = pathlib.Path(path)
+        self.maxsize = maxsize
+        self._options = repr(sorted(options.items())) + "\n" + version + "\n"
+
+    def _key(self, kind: str, data: str) -> str:
+        return hashlib.sha256((kind + "\n" + self._options + data).encode()).hexdigest()
+
+    def _entry(self, key: str) -> pathlib.Path:
+        return self.path / key[:2] / key
+
+    def _read(self, key: str) -> str:
+        entry = self._entry(key)
+        try:
+            ret = entry.read_text()
+            os.utime(entry)
+        except OSError:
+            return None
+        return ret
+
+    def _write(self, key: str, data: str):
+        entry = self._entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=entry.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(data)
+            os.replace(tmp, entry)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def is_clean(self, filepath: str) -> bool:
+        """
+        Check without reading the file if it is formatted:
+        the file was found to be formatted before and its modification time and size did not
+        change since.
+
+        :param filepath: Path to the file.
+        :return: ``True`` if the file is known to be formatted.
+        """
+        filepath = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        return self._read(self._key("stat", filepath)) == f"{stat.st_mtime_ns:d} {stat.st_size:d}"
+
+    def set_clean(self, filepath: str, text: str):
+        """
+        Store that a file is formatted.
+        To avoid missing changes that do not modify the modification time,
+        files that were modified less than two seconds ago are not recorded.
+
+        :param filepath: Path to the file.
+        :param text: Content of the file.
+        """
+        filepath = os.path.abspath(filepath)
+        self._write(self._key("content", text), "clean\n")
+        stat = os.stat(filepath)
+        if time.time_ns() - stat.st_mtime_ns < 2 * 10**9:
+            return
+        self._write(self._key("stat", filepath), f"{stat.st_mtime_ns:d} {stat.st_size:d}")
+
+    def get(self, text: str) -> str:
+        """
+        Get the formatted content of a file.
+
+        :param text: Content of the file.
+        :return: Formatted content (``None`` if not in the cache).
+        """
+        ret = self._read(self._key("content", text))
+        if ret is None:
+            return None
+        if ret == "clean\n":
+            return text
+        return ret[len("formatted\n") :]  # noqa: E203
+
+    def set(self, text: str, formatted: str):
+        """
+        Store the formatted content of a file.
+
+        :param text: Content of the file.
+        :param formatted: Formatted content.
+        """
+        if formatted == text:
+            self._write(self._key("content", text), "clean\n")
+        else:
+            self._write(self._key("content", text), "formatted\n" + formatted)
+
+    def prune(self):
+        """
+        Remove the least recently used entries until the cache does not exceed ``maxsize``.
+        """
+        entries = []
+        for entry in self.path.glob("*/*"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+
+        size = sum(i[1] for i in entries)
+        for _, n, entry in sorted(entries, key=lambda i: i[0]):
+            if size <= self.maxsize:
+                return
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+            size -= n
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        for entry in self.path.glob("*/*"):
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+
+
+def _format_file(filepath: str, cache: FormatCache, apply: callable) -> bool:
+    """
+    Format a file in-place.
+    If a cache is specified an unchanged file is skipped (without reading it if possible).
+
+    :param filepath: Path to the file.
+    :param cache: Cache, see :py:class:`FormatCache` (or ``None``).
+    :param apply:
+        Function that takes the path and the content of a file and returns the formatted content.
+    :return: ``True`` if the file was changed.
+    """
+
+    if cache is not None and cache.is_clean(filepath):
+        return False
+
+    filepath = pathlib.Path(filepath)
+    orig = filepath.read_text()
+    formatted = cache.get(orig) if cache is not None else None
+
+    if formatted is None:
+        formatted = apply(filepath, orig)
+        if cache is not None:
+            cache.set(orig, formatted)
+
+    if formatted != orig:
+        filepath.write_text(formatted)
+        return True
+
+    # only unchanged output is known to be formatted (formatting need not be idempotent)
+    if cache is not None:
+        cache.set_clean(filepath, formatted)
+
+    return False
+
+
+def _format_files(
+    files: list[str], cache: FormatCache, apply: callable, jobs: int = 1, catch: bool = True
+) -> list:
+    """
+    Format files in-place, see :py:func:`_format_file`.
+    The files can be formatted in parallel (largest files first).
+    An error in one file does not stop the formatting of the other files
+    (unless ``catch=False``).
+
+    :param files: List of files.
+    :param cache: Cache, see :py:class:`FormatCache` (or ``None``).
+    :param apply:
+        Function that takes the path and the content of a file and returns the formatted content.
+        It must be picklable if ``jobs != 1``.
+    :param jobs: Number of processes (``0``: number of cores).
+    :param catch: If ``False`` the first error is raised (if formatting one file at a time).
+    :return:
+        Per file (same order as ``files``):
+        ``True`` if the file was changed, ``False`` if not, or the exception that was raised.
+    """
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    ret = [None] * len(files)
+
+    if jobs == 1 or len(files) <= 1:
+        for i, filepath in enumerate(files):
+            try:
+                ret[i] = _format_file(filepath, cache, apply)
+            except Exception as error:
+                if not catch:
+                    raise
+                ret[i] = error
+    else:
+        order = sorted(range(len(files)), key=lambda i: os.path.getsize(files[i]), reverse=True)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {i: pool.submit(_format_file, files[i], cache, apply) for i in order}
+            for i, future in futures.items():
+                try:
+                    ret[i] = future.result()
+                except Exception as error:
+                    ret[i] = error
+
+    if cache is not None:
+        cache.prune()
+
+    return ret
+
+
+def _error_messages(prog: str, files: list[str], results: list) -> list[str]:
+    """
+    Error messages of :py:func:`_format_files` (in the order of ``files``).
+
+    :param prog: Name of the program.
+    :param files: List of files.
+    :param results: Output of :py:func:`_format_files`.
+    :return: List of messages.
+    """
+    ret = []
+    for filepath, result in zip(files, results):
+        if isinstance(result, Exception):
+            ret += [f"{prog}: {filepath}: {type(result).__name__}: {result}"]
+    return ret
+
+
+def _report_errors(prog: str, files: list[str], results: list, summary: bool = False) -> int:
+    """
+    Print the errors of :py:func:`_format_files` to ``stderr`` (in the order of ``files``).
+
+    :param prog: Name of the program.
+    :param files: List of files.
+    :param results: Output of :py:func:`_format_files`.
+    :param summary: Print the number of changed, unchanged, and failed files to ``stdout``.
+    :return: Exit status: ``1`` if there was an error, ``0`` otherwise.
+    """
+    errors = _error_messages(prog, files, results)
+    failed = len(errors)
+    for error in errors:
+        print(error, file=sys.stderr)
+
+    if summary:
+        changed = sum(result is True for result in results)
+        unchanged = sum(result is False for result in results)
+        print(f"{prog}: {changed:d} changed, {unchanged:d} unchanged, {failed:d} failed")
+
+    return int(failed > 0)
+
+
+def _jobs(value: str) -> int:
+    """
+    Type of the ``--jobs`` option of the command-line tools: a non-negative integer.
+    """
+    ret = int(value)
+    if ret < 0:
+        raise argparse.ArgumentTypeError(f"invalid number of jobs: {value}")
+    return ret
+
+
+def _format_cache(args: argparse.Namespace, options: dict) -> FormatCache:
+    """
+    Cache of the command-line tools, as selected by ``--cache`` and ``--cache-dir``.
+
+    :param args: Parsed command-line arguments.
+    :param options: Options of the tool, see :py:class:`FormatCache`.
+    :return: :py:class:`FormatCache` (``None`` if no cache is used).
+    """
+    if args.cache_dir is not None:
+        return FormatCache(args.cache_dir, options)
+    if args.cache:
+        return FormatCache(_default_cache_dir(), options)
+    return None
+
+
 def _texcleanup_parser():
     """
     Return parser for :py:func:`texcleanup`.
@@ -2713,6 +4724,32 @@ def _texcleanup_parser():
         help="Apply ``re.sub(pattern, repl, text)``.",
     )
 
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"Skip files that are unchanged since a previous run (cache: {_default_cache_dir()}).",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="As --cache, but with the cache in the specified directory.",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_jobs,
+        default=1,
+        help="Number of files to clean-up in parallel (0: number of cores).",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print the number of changed, unchanged, and failed files (default if --jobs != 1).",
+    )
+
     parser.add_argument("-v", "--version", action="version", version=version)
     parser.add_argument("files", nargs="+", type=str, help="TeX file(s) (changed in-place).")
 
@@ -2722,6 +4759,8 @@ def _texcleanup_parser():
 def texcleanup(args: list[str]):
     """
     Command-line tool to copy to clean output directory, see ``--help``.
+
+    :return: Exit status: ``1`` if any file could not be cleaned-up, ``0`` otherwise.
     """
 
     parser = _texcleanup_parser()
@@ -2731,45 +4770,71 @@ def texcleanup(args: list[str]):
     args = parser.parse_args(args)
     assert all([os.path.isfile(file) for file in args.files])
 
-    for file in args.files:
-        tex = TeX.from_file(file)
+    ignore = ["files", "cache", "cache_dir", "jobs", "verbose"]
+    options = {key: value for key, value in vars(args).items() if key not in ignore}
+    options["tool"] = "texcleanup"
+    cache = _format_cache(args, options)
+    apply = functools.partial(_texcleanup_file, args=args)
+    results = _format_files(args.files, cache, apply, args.jobs, catch=args.jobs != 1)
+    return _report_errors("texcleanup", args.files, results, summary=args.jobs != 1 or args.verbose)
+
+
+def _texcleanup_file(filepath: str, text: str, args: argparse.Namespace) -> str:
+    """
+    Apply :py:func:`texcleanup` to one file.
+
+    :param filepath: Path to the file.
+    :param text: Content of the file.
+    :param args: Parsed command-line arguments.
+    :return: Formatted content.
+    """
+    tex = TeX.from_file(filepath, text)
 
-        if args.remove_commentlines or args.remove_comments:
-            tex.remove_commentlines()
+    if args.remove_commentlines or args.remove_comments:
+        tex.remove_commentlines()
 
-        if args.remove_comments:
-            tex.remove_comments()
+    if args.remove_comments:
+        tex.remove_comments()
 
-        if args.replace_command:
-            for i in args.replace_command:
-                tex.replace_command(*i, ignore_commented=True)
+    if args.replace_command:
+        for i in args.replace_command:
+            tex.replace_command(*i, ignore_commented=True)
 
-        if args.change_label:
-            for i in args.change_label:
-                tex.change_label(*i)
+    if args.change_label:
+        # compose the renames in the order they are specified (e.g. a -> b -> c),
+        # labels that are renamed back (e.g. a -> b -> a) are kept
+        mapping = {}
+        for old, new in args.change_label:
+            for key, value in mapping.items():
+                if value == old:
+                    mapping[key] = new
+            mapping.setdefault(old, new)
+        tex.change_labels(mapping)
 
-        if args.format_labels:
-            tex.format_labels()
+    if args.format_labels:
+        tex.format_labels()
 
-        if args.prepend_format_labels:
-            tex.format_labels(args.prepend_format_labels)
+    if args.prepend_format_labels:
+        tex.format_labels(args.prepend_format_labels)
 
-        if args.use_cleveref:
-            tex.use_cleveref()
+    if args.use_cleveref:
+        tex.use_cleveref()
 
-        if args.fix_quotes:
-            tex.fix_quotes()
+    if args.fix_quotes:
+        tex.fix_quotes()
 
+    if args.re_sub:
         for pattern, repl in args.re_sub:
-            tex.main = re.sub(pattern, repl, tex.main)
+            tex.main = _sub(pattern, repl, tex.main)
+
+    if tex.changed():
+        return str(tex)
 
-        if tex.changed():
-            with open(file, "w") as file:
-                file.write(str(tex))
+    return tex.original
 
 
 def _texcleanup_cli():
-    texcleanup(sys.argv[1:])
+    sys.exit(texcleanup(sys.argv[1:]))
 
 
 def _texplain_parser():
@@ -2883,8 +4948,63 @@ def _texindent_parser():
     desc = "Indent code using :py:func:`texplain.indent`."
     parser = argparse.ArgumentParser(description=desc)
 
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"Skip files that are unchanged since a previous run (cache: {_default_cache_dir()}).",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="As --cache, but with the cache in the specified directory.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_jobs,
+        default=1,
+        help="Number of files to format in parallel (0: number of cores).",
+    )
+    parser.add_argument(
+        "--split-sections",
+        action="store_true",
+        help="Format sections of each file in parallel (files one after the other), see --jobs.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Print the time spent per stage of formatting and performance counters "
+            "(formats files one after the other)."
+        ),
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running: format the files (or text) sent with --client.",
+    )
+    parser.add_argument(
+        "--client",
+        action="store_true",
+        help="Let a daemon format the files (formatted here if no daemon is running).",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=_default_socket(),
+        help="Socket of the daemon, '-' for stdin/stdout (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=600,
+        help="Stop the daemon after this many seconds without requests (default: %(default)s).",
+    )
     parser.add_argument("-v", "--version", action="version", version=version)
-    parser.add_argument("files", nargs="+", type=str, help="TeX file(s) (changed in-place).")
+    parser.add_argument(
+        "files", nargs="*", type=str, help="TeX file(s) (changed in-place), '-' for stdin/stdout."
+    )
 
     return parser
 
@@ -2892,28 +5012,374 @@ def _texindent_parser():
 def texindent_cli(args: list[str]):
     """
     Indent TeX file, see ``--help``.
+
+    :return: Exit status: ``1`` if any file could not be formatted, ``0`` otherwise.
     """
 
     parser = _texindent_parser()
     args = parser.parse_args(args)
-    assert all([os.path.isfile(file) for file in args.files])
 
-    for filepath in args.files:
-        filepath = pathlib.Path(filepath)
-        orig = filepath.read_text()
+    if len(args.files) == 0 and not args.daemon:
+        parser.error("the following arguments are required: files")
+
+    if len(args.files) > 0 and args.daemon:
+        parser.error("--daemon does not take files, format them with --client")
+
+    if args.files == ["-"]:
+        request = {"text": sys.stdin.read()}
+    else:
+        assert all([os.path.isfile(file) for file in args.files])
+        request = {"files": [os.path.abspath(file) for file in args.files]}
+
+    if args.client:
+        try:
+            response = texindent_client(request, args.socket)
+        except OSError:
+            response = None
+        if response is not None:
+            for error in response["errors"]:
+                print(error, file=sys.stderr)
+            if "text" in response:
+                sys.stdout.write(response["text"])
+            return response["status"]
+
+    cache = _format_cache(args, {"tool": "texindent"})
+
+    if args.split_sections:
+        apply = functools.partial(_texindent_file, jobs=args.jobs)
+        jobs = 1
+    else:
+        apply = _texindent_file
+        jobs = args.jobs
+
+    if args.profile:
+        return _texindent_profile(request, cache, apply)
+
+    if args.daemon:
+        handler = functools.partial(_texindent_request, cache=cache, apply=apply, jobs=jobs)
+        texindent_daemon(handler, args.socket, args.idle_timeout)
+        return 0
 
-        tex = TeX(orig)
-        tex.preamble = indent(tex.preamble)
+    response = _texindent_request(request, cache, apply, jobs, catch=args.jobs != 1)
+    for error in response["errors"]:
+        print(error, file=sys.stderr)
+    if "text" in response:
+        sys.stdout.write(response["text"])
+    return response["status"]
+
+
+def _texindent_file(filepath: str, text: str, jobs: int = None) -> str:
+    """
+    Apply :py:func:`texindent_cli` to one file.
+
+    :param filepath: Path to the file.
+    :param text: Content of the file.
+    :param jobs: Format the sections of the main text in parallel, see :py:func:`indent_parallel`.
+    :return: Formatted content.
+    """
+    tex = TeX(text)
+    tex.preamble = indent(tex.preamble)
+    if jobs is None:
         tex.main = indent(tex.main)
-        tex.postamble = indent(tex.postamble)
-        formatted = str(tex)
+    else:
+        tex.main = indent_parallel(tex.main, jobs=jobs)
+    tex.postamble = indent(tex.postamble)
+    return str(tex)
+
+
+def _texindent_request(
+    request: dict, cache: FormatCache, apply: callable, jobs: int = 1, catch: bool = True
+) -> dict:
+    """
+    Format the files or text of a request of :py:func:`texindent_client`.
+
+    :param request:
+        ``{"files": [...]}`` to format files in-place, or ``{"text": "..."}`` to format text.
+    :param cache: Cache, see :py:class:`FormatCache` (or ``None``).
+    :param apply: Function that formats a file, see :py:func:`_texindent_file`.
+    :param jobs: Number of processes, see :py:func:`_format_files`.
+    :param catch: If ``False`` errors are raised, see :py:func:`_format_files`.
+    :return:
+        ``{"status": ..., "errors": [...]}`` with the exit status and error messages,
+        and the formatted ``"text"`` if text was sent.
+    """
+
+    if "text" in request:
+        try:
+            return {"status": 0, "errors": [], "text": apply(None, request["text"])}
+        except Exception as error:
+            if not catch:
+                raise
+            message = f"texindent: -: {type(error).__name__}: {error}"
+            return {"status": 1, "errors": [message], "text": request["text"]}
+
+    results = _format_files(request["files"], cache, apply, jobs, catch)
+    errors = _error_messages("texindent", request["files"], results)
+    return {"status": int(len(errors) > 0), "errors": errors}
+
+
+def _texindent_profile(request: dict, cache: FormatCache, apply: callable) -> int:
+    """
+    Format the files or text of a request (see :py:func:`_texindent_request`) one by one,
+    and print the time spent per stage (see :py:class:`IndentProfile`) and the counters
+    (see :py:class:`PerformanceCounters`) to ``stderr``: per file, and for all files.
+
+    :param request: Request, see :py:func:`_texindent_request`.
+    :param cache: Cache, see :py:class:`FormatCache` (or ``None``).
+    :param apply: Function that formats a file, see :py:func:`_texindent_file`.
+    :return: Exit status: ``1`` if any file could not be formatted, ``0`` otherwise.
+    """
+
+    if "text" in request:
+        requests = [("-", request)]
+    else:
+        requests = [(filepath, {"files": [filepath]}) for filepath in request["files"]]
+
+    total = IndentProfile()
+    total_counters = PerformanceCounters()
+    status = 0
+
+    for name, request in requests:
+        with IndentProfile() as profile, PerformanceCounters() as counters:
+            response = _texindent_request(request, cache, apply)
+        for error in response["errors"]:
+            print(error, file=sys.stderr)
+        if "text" in response:
+            sys.stdout.write(response["text"])
+        print(profile.report(name) + "\n", file=sys.stderr)
+        print(counters.report(name) + "\n", file=sys.stderr)
+        status = max(status, response["status"])
+        total += profile
+        total_counters += counters
+
+    if len(requests) > 1:
+        print(total.report(f"all {len(requests):d} files") + "\n", file=sys.stderr)
+        print(total_counters.report(f"all {len(requests):d} files"), file=sys.stderr)
+
+    return status
+
+
+def _default_socket() -> str:
+    """
+    Default socket of :py:func:`texindent_daemon`: ``$XDG_RUNTIME_DIR/texindent.sock``
+    (in a private directory per user in the temporary directory if ``XDG_RUNTIME_DIR``
+    is not set).
+    """
+    if "XDG_RUNTIME_DIR" in os.environ:
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "texindent.sock")
+    user = os.getuid() if hasattr(os, "getuid") else os.getpid()
+    return os.path.join(tempfile.gettempdir(), f"texindent-{user:d}", "texindent.sock")
+
+
+def _check_owner(path: str, sticky: bool = False):
+    """
+    Check that a path (the socket of :py:func:`texindent_daemon` or its directory) is owned by
+    the current user: otherwise another user could receive or alter the documents.
+
+    :param path: Path.
+    :param sticky:
+        Accept a directory of another user if it has the sticky bit set (e.g. ``/tmp``):
+        only the owner of the socket can remove or rename it.
+    :raise PermissionError: If the path is owned by another user.
+    """
+    if not hasattr(os, "getuid"):
+        return
+    info = os.stat(path)
+    if sticky and info.st_mode & stat.S_ISVTX:
+        return
+    if info.st_uid != os.getuid():
+        raise PermissionError(f'"{path}" is not owned by the current user')
+
+
+def _check_unix_sockets():
+    """
+    :raise OSError: If Unix sockets are not supported (e.g. on Windows).
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix sockets are not supported on this platform")
+
+
+class _Activity:
+    """
+    Track if requests are being handled, and since when no request has been handled.
+    Use as context manager around each request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = 0
+        self._last = time.monotonic()
+
+    def __enter__(self):
+        with self._lock:
+            self._active += 1
+
+    def __exit__(self, *args):
+        with self._lock:
+            self._active -= 1
+            self._last = time.monotonic()
+
+    def idle(self) -> float:
+        """
+        :return: Number of seconds without active requests.
+        """
+        with self._lock:
+            if self._active > 0:
+                return 0
+            return time.monotonic() - self._last
+
+
+def _daemon_respond(handler: callable, activity: _Activity, line: bytes) -> bytes:
+    """
+    Respond to one request of :py:func:`texindent_daemon`.
+
+    :param handler: Function that takes a request and returns the response.
+    :param activity: Activity of the daemon.
+    :param line: JSON encoded request (one line).
+    :return: JSON encoded response (one line), ``"id"`` of the request is copied.
+    """
+    with activity:
+        try:
+            request = json.loads(line)
+            response = handler(request)
+        except Exception as error:
+            request = {}
+            response = {"status": 1, "errors": [f"texindent: {type(error).__name__}: {error}"]}
+        if "id" in request:
+            response["id"] = request["id"]
+        return json.dumps(response).encode() + b"\n"
+
+
+def texindent_daemon(handler: callable, path: str = None, idle_timeout: float = 600):
+    """
+    Serve requests of :py:func:`texindent_client` until no request was made for some time.
+    Requests (and responses) are JSON encoded, one per line.
+    Requests are handled concurrently.
+
+    :param handler: Function that takes a request and returns the response.
+    :param path: Path of the Unix socket to listen on, ``"-"`` to use stdin/stdout.
+    :param idle_timeout: Stop after this many seconds without requests.
+    """
+
+    if path is None:
+        path = _default_socket()
+
+    activity = _Activity()
+    respond = functools.partial(_daemon_respond, handler, activity)
+
+    if path == "-":
+        return _texindent_daemon_stdio(respond, activity, idle_timeout)
+
+    _check_unix_sockets()
+    dirname = os.path.dirname(os.path.abspath(path))
+    os.makedirs(dirname, mode=0o700, exist_ok=True)
+    _check_owner(dirname, sticky=True)
+
+    if os.path.exists(path):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(path)
+            raise OSError(f'Daemon already running on "{path}"')
+        except ConnectionRefusedError:
+            os.remove(path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                self.wfile.write(respond(line))
+                self.wfile.flush()
+
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    os.chmod(path, 0o600)
+    stop = threading.Event()
+
+    def watchdog():
+        while not stop.wait(min(idle_timeout, 1)):
+            if activity.idle() > idle_timeout:
+                server.shutdown()
+                return
+
+    thread = threading.Thread(target=watchdog, daemon=True)
+    thread.start()
+
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _texindent_daemon_stdio(respond: callable, activity: _Activity, idle_timeout: float):
+    """
+    Serve requests read from stdin and write the responses to stdout,
+    see :py:func:`texindent_daemon`.
+    Stops when stdin is closed or after ``idle_timeout`` seconds without requests.
+
+    :param respond: Function that takes a request and returns the response.
+    :param activity: Activity of the daemon.
+    :param idle_timeout: Stop after this many seconds without requests.
+    """
+
+    lines = queue.Queue()
+    lock = threading.Lock()
+
+    def read():
+        for line in sys.stdin.buffer:
+            lines.put(line)
+        lines.put(None)
+
+    def write(line):
+        response = respond(line)
+        with lock:
+            sys.stdout.buffer.write(response)
+            sys.stdout.buffer.flush()
+
+    threading.Thread(target=read, daemon=True).start()
+
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        while True:
+            try:
+                line = lines.get(timeout=min(idle_timeout, 1))
+            except queue.Empty:
+                if activity.idle() > idle_timeout:
+                    break
+                continue
+            if line is None:
+                break
+            pool.submit(write, line)
+
+
+def texindent_client(request: dict, path: str = None) -> dict:
+    """
+    Send a request to :py:func:`texindent_daemon`, wait for the response.
+
+    :param request: ``{"files": [...]}`` (absolute paths) or ``{"text": "..."}``.
+    :param path: Path of the Unix socket of the daemon.
+    :return: Response, see :py:func:`_texindent_request`.
+    :raise OSError:
+        If no daemon can be reached, if the socket is not owned by the current user,
+        or if Unix sockets are not supported.
+    """
+
+    if path is None:
+        path = _default_socket()
+
+    _check_unix_sockets()
+    _check_owner(path)
 
-        if formatted != orig:
-            filepath.write_text(formatted)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall(json.dumps(request).encode() + b"\n")
+        client.shutdown(socket.SHUT_WR)
+        with client.makefile("rb") as response:
+            return json.loads(response.readline())
 
 
 def _texindent_cli():
-    texindent_cli(sys.argv[1:])
+    sys.exit(texindent_cli(sys.argv[1:]))
 
 
 if __name__ == "__main__":